@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from PyQt5.QtCore import QCoreApplication, QDateTime, QThreadPool, QTimer, Qt, pyqtSignal
+from PyQt5.QtWidgets import QAbstractItemView, QCheckBox, QDateTimeEdit, QDialog, QDialogButtonBox, QFileDialog, \
+    QFormLayout, QGridLayout, QHBoxLayout, QLabel, QLineEdit, QMessageBox, QPushButton, QTreeWidget, QTreeWidgetItem
+
+from archive_index import ArchiveIndex
+from file_loader import ArchiveIndexer
+
+
+class ArchiveBrowser(QDialog):
+    SEARCH_DELAY: int = 200  # ms
+
+    # the indices of the curves chosen by the files holding them
+    curves_chosen: pyqtSignal = pyqtSignal(object)
+
+    def __init__(self, directory: str = '', index_file_name: str = '', parent=None):
+        super(ArchiveBrowser, self).__init__(parent)
+
+        self._translate = QCoreApplication.translate
+
+        self.resize(720, 540)
+
+        self.main_layout = QGridLayout(self)
+
+        self.layout_directory = QHBoxLayout()
+        self.text_directory = QLineEdit(self)
+        self.layout_directory.addWidget(QLabel(self._translate('ArchiveBrowser', 'Directory:'), self))
+        self.layout_directory.addWidget(self.text_directory)
+        self.button_browse = QPushButton(self._translate('ArchiveBrowser', 'Browse...'), self)
+        self.layout_directory.addWidget(self.button_browse)
+        self.button_update = QPushButton(self._translate('ArchiveBrowser', 'Update Index'), self)
+        self.layout_directory.addWidget(self.button_update)
+        self.main_layout.addLayout(self.layout_directory, 0, 0, 1, 1)
+
+        self.layout_search = QFormLayout()
+        self.text_legend = QLineEdit(self)
+        self.text_legend.setPlaceholderText(self._translate('ArchiveBrowser', 'e.g., run 1*'))
+        self.layout_search.addRow(self._translate('ArchiveBrowser', 'Legend:'), self.text_legend)
+        self.text_search = QLineEdit(self)
+        self.text_search.setPlaceholderText(self._translate('ArchiveBrowser',
+                                                            'the sample name, the program, the configuration, '
+                                                            'or the file name'))
+        self.layout_search.addRow(self._translate('ArchiveBrowser', 'Text:'), self.text_search)
+        self.check_from = QCheckBox(self._translate('ArchiveBrowser', 'Recorded from:'), self)
+        self.datetime_from = QDateTimeEdit(self)
+        self.layout_search.addRow(self.check_from, self.datetime_from)
+        self.check_to = QCheckBox(self._translate('ArchiveBrowser', 'Recorded until:'), self)
+        self.datetime_to = QDateTimeEdit(self)
+        self.layout_search.addRow(self.check_to, self.datetime_to)
+        for check, datetime_edit in ((self.check_from, self.datetime_from), (self.check_to, self.datetime_to)):
+            datetime_edit.setCalendarPopup(True)
+            datetime_edit.setDisplayFormat('yyyy-MM-dd HH:mm:ss')
+            datetime_edit.setDateTime(QDateTime.currentDateTime())
+            datetime_edit.setEnabled(False)
+            check.toggled.connect(datetime_edit.setEnabled)
+        self.check_directory_only = QCheckBox(self._translate('ArchiveBrowser', 'Only the files in the directory'),
+                                              self)
+        self.check_directory_only.setChecked(True)
+        self.layout_search.setWidget(4, QFormLayout.SpanningRole, self.check_directory_only)
+        self.main_layout.addLayout(self.layout_search, 1, 0, 1, 1)
+
+        self.tree_results = QTreeWidget(self)
+        self.tree_results.setHeaderLabels([self._translate('ArchiveBrowser', 'Time'),
+                                           self._translate('ArchiveBrowser', 'Duration'),
+                                           self._translate('ArchiveBrowser', 'Legend'),
+                                           self._translate('ArchiveBrowser', 'Sample'),
+                                           self._translate('ArchiveBrowser', 'File')])
+        self.tree_results.setRootIsDecorated(False)
+        self.tree_results.setUniformRowHeights(True)
+        self.tree_results.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.main_layout.addWidget(self.tree_results, 2, 0, 1, 1)
+
+        self.label_status = QLabel(self)
+        self.main_layout.addWidget(self.label_status, 3, 0, 1, 1)
+
+        self.buttonBox = QDialogButtonBox(self)
+        self.buttonBox.setOrientation(Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QDialogButtonBox.Close | QDialogButtonBox.Open)
+        self.buttonBox.button(QDialogButtonBox.Open).setToolTip(
+            self._translate('ArchiveBrowser', 'Open the curves selected, or all the curves found if none is'))
+        self.main_layout.addWidget(self.buttonBox, 4, 0, 1, 1)
+
+        self.setWindowTitle(self._translate('ArchiveBrowser', 'Archive'))
+
+        self.buttonBox.accepted.connect(self.open_curves)
+        self.buttonBox.rejected.connect(self.reject)
+        self.button_browse.clicked.connect(self.browse)
+        self.button_update.clicked.connect(self.update_index)
+        self.tree_results.itemDoubleClicked.connect(self.open_curves)
+
+        self._index_file_name: str = index_file_name
+        self._index: Optional[ArchiveIndex] = None
+        self._indexer: Optional[ArchiveIndexer] = None
+        self._found: List[ArchiveIndex.Entry] = []
+
+        # the index is searched a moment after the query stops changing
+        self._search_timer: QTimer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY)
+        self._search_timer.timeout.connect(self.search)
+        for signal in (self.text_legend.textChanged, self.text_search.textChanged,
+                       self.check_from.toggled, self.datetime_from.dateTimeChanged,
+                       self.check_to.toggled, self.datetime_to.dateTimeChanged,
+                       self.check_directory_only.toggled, self.text_directory.editingFinished):
+            signal.connect(self.schedule_search)
+
+        self.text_directory.setText(directory)
+
+    @property
+    def directory(self) -> str:
+        return self.text_directory.text()
+
+    @property
+    def index(self) -> Optional[ArchiveIndex]:
+        if self._index is None:
+            try:
+                self._index = ArchiveIndex(self._index_file_name)
+            except (OSError, sqlite3.Error) as ex:
+                self.label_status.setText(self._translate('ArchiveBrowser', 'Cannot open the index: ')
+                                          + (getattr(ex, 'strerror', None) or str(ex)))
+        return self._index
+
+    @property
+    def is_indexing(self) -> bool:
+        return self._indexer is not None
+
+    def browse(self):
+        directory: str = QFileDialog.getExistingDirectory(self, directory=self.directory,
+                                                          options=QFileDialog.DontUseNativeDialog)
+        if directory:
+            self.text_directory.setText(directory)
+            self.update_index()
+
+    def update_index(self):
+        # the files new or changed since the last time get indexed in a worker thread
+        if not self.directory or self.index is None:
+            return
+        self.cancel_indexing()
+        self._indexer = ArchiveIndexer(self.directory, self.index.file_name)
+        self._indexer.signals.progress.connect(self.on_indexing_progress)
+        self._indexer.signals.finished.connect(self.on_indexing_finished)
+        self._indexer.signals.failed.connect(self.on_indexing_failed)
+        self.label_status.setText(self._translate('ArchiveBrowser', 'Looking for the files changed'))
+        self.button_update.setEnabled(False)
+        QThreadPool.globalInstance().start(self._indexer)
+
+    def cancel_indexing(self):
+        if self._indexer is None:
+            return
+        self._indexer.cancel()
+        self._indexer.signals.disconnect()
+        self._indexer = None
+        self.button_update.setEnabled(True)
+
+    def _is_current_indexer_signal(self) -> bool:
+        # the signals queued before the indexing got cancelled still arrive
+        return self._indexer is not None and self.sender() is self._indexer.signals
+
+    def on_indexing_progress(self, files_done: int, files_count: int):
+        if not self._is_current_indexer_signal():
+            return
+        self.label_status.setText(self._translate('ArchiveBrowser', 'Indexed {0} of {1} files')
+                                  .format(files_done, files_count))
+        # show the files indexed so far from time to time
+        if not self._search_timer.isActive() and files_done % ArchiveIndex.COMMIT_FILES == 0:
+            self._search_timer.start()
+
+    def on_indexing_finished(self, files_indexed: int, files_removed: int):
+        if not self._is_current_indexer_signal():
+            return
+        self._indexer = None
+        self.button_update.setEnabled(True)
+        self.search()
+        if files_indexed or files_removed:
+            self.label_status.setText(self.label_status.text() + '; '
+                                      + self._translate('ArchiveBrowser', '{0} files indexed, {1} files gone')
+                                      .format(files_indexed, files_removed))
+
+    def on_indexing_failed(self, message: str):
+        if not self._is_current_indexer_signal():
+            return
+        self._indexer = None
+        self.button_update.setEnabled(True)
+        QMessageBox.warning(self, self.windowTitle(), f'Cannot index {self.directory}:\n{message}.')
+
+    def schedule_search(self, *_):
+        self._search_timer.start()
+
+    def search(self):
+        if self.index is None:
+            return
+        start: Optional[datetime] = self.datetime_from.dateTime().toPyDateTime() if self.check_from.isChecked() \
+            else None
+        stop: Optional[datetime] = self.datetime_to.dateTime().toPyDateTime() if self.check_to.isChecked() else None
+        try:
+            self._found = self.index.find(start, stop, self.text_legend.text(), self.text_search.text(),
+                                          self.directory if self.check_directory_only.isChecked() else '')
+        except sqlite3.Error as ex:
+            self.label_status.setText(str(ex))
+            return
+        self.tree_results.setUpdatesEnabled(False)
+        self.tree_results.clear()
+        items: List[QTreeWidgetItem] = []
+        for entry in self._found:
+            item: QTreeWidgetItem = QTreeWidgetItem([f'{entry.time:%Y-%m-%d %H:%M:%S}', f'{entry.duration:g}',
+                                                     entry.legend_key, entry.sample_name, entry.file_name])
+            item.setToolTip(4, entry.file_name)
+            items.append(item)
+        self.tree_results.addTopLevelItems(items)
+        self.tree_results.setUpdatesEnabled(True)
+        if len(self._found) >= ArchiveIndex.DEFAULT_LIMIT:
+            self.label_status.setText(self._translate('ArchiveBrowser', 'The first {0} curves found')
+                                      .format(len(self._found)))
+        else:
+            self.label_status.setText(self._translate('ArchiveBrowser', '{0} curves found').format(len(self._found)))
+
+    def open_curves(self, *_):
+        rows: List[int] = sorted(self.tree_results.indexOfTopLevelItem(item)
+                                 for item in self.tree_results.selectedItems()) or list(range(len(self._found)))
+        chosen: Dict[str, List[int]] = dict()
+        for row in rows:
+            chosen.setdefault(self._found[row].file_name, []).append(self._found[row].index)
+        if chosen:
+            self.curves_chosen.emit({file_name: sorted(indices) for file_name, indices in chosen.items()})
+
+    def done(self, result: int):
+        self.cancel_indexing()
+        super(ArchiveBrowser, self).done(result)
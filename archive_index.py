@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from irtecon_cache import default_cache_directory
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONHeader, iter_irtecon_file
+
+ARCHIVE_FILE_SUFFIX: str = '.grd'
+
+
+def default_archive_index_file() -> str:
+    return os.path.join(default_cache_directory(), 'archive.sqlite3')
+
+
+class ArchiveIndex:
+    # the headers, the axes, and the curve headers of the IRTECON files of directory trees, but no curve data;
+    # a file is indexed again only when its modification time or its size changes
+    FORMAT_VERSION: int = 1
+    # the files indexed between the commits
+    COMMIT_FILES: int = 100
+    DEFAULT_LIMIT: int = 10000
+
+    class Entry:
+        def __init__(self, file_name: str, index: int, time: datetime, duration: float, legend_key: str,
+                     sample_name: str):
+            self.file_name: str = file_name
+            # the index of the curve in the file
+            self.index: int = index
+            self.time: datetime = time
+            self.duration: float = duration
+            self.legend_key: str = legend_key
+            self.sample_name: str = sample_name
+
+        def __repr__(self):
+            return 'ArchiveIndex.Entry(' + ', '.join(f'{key}={repr(value)}'
+                                                     for key, value in self.__dict__.items()) + ')'
+
+    def __init__(self, file_name: str = ''):
+        self.file_name: str = file_name or default_archive_index_file()
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_name)), exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(self.file_name, timeout=30.)
+        # let the index be searched while another connection updates it
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA foreign_keys=ON')
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] != self.FORMAT_VERSION:
+            self._create_tables()
+        self._legend_ids: Dict[str, int] = dict()
+
+    def _create_tables(self):
+        with self._connection:
+            self._connection.executescript(f'''
+                DROP TABLE IF EXISTS curves;
+                DROP TABLE IF EXISTS legends;
+                DROP TABLE IF EXISTS axes;
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,
+                                    mtime INTEGER NOT NULL, size INTEGER NOT NULL,
+                                    program TEXT NOT NULL DEFAULT '', configuration_file TEXT NOT NULL DEFAULT '',
+                                    sample_name TEXT NOT NULL DEFAULT '', error TEXT);
+                CREATE TABLE axes (file INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+                                   axis INTEGER NOT NULL, name TEXT NOT NULL, unit TEXT NOT NULL,
+                                   min REAL NOT NULL, max REAL NOT NULL);
+                CREATE TABLE legends (id INTEGER PRIMARY KEY, legend_key TEXT UNIQUE NOT NULL);
+                CREATE TABLE curves (file INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+                                     number INTEGER NOT NULL, time TEXT NOT NULL, duration REAL NOT NULL,
+                                     legend INTEGER NOT NULL REFERENCES legends(id));
+                CREATE INDEX axes_file ON axes(file);
+                CREATE INDEX curves_file ON curves(file, time);
+                CREATE INDEX curves_time ON curves(time);
+                CREATE INDEX curves_legend ON curves(legend, time, file, number, duration);
+                PRAGMA user_version={self.FORMAT_VERSION};
+            ''')
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def _directory_range(directory: str) -> Tuple[str, str]:
+        # the bounds of the paths within the directory, to compare the paths as strings
+        prefix: str = os.path.join(os.path.realpath(directory), '')
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def _indexed_files(self, directory: str) -> Dict[str, Tuple[int, int]]:
+        return {path: (mtime, size) for path, mtime, size
+                in self._connection.execute('SELECT path, mtime, size FROM files WHERE path >= ? AND path < ?',
+                                            self._directory_range(directory))}
+
+    @staticmethod
+    def _walk(directory: str) -> Iterator[Tuple[str, os.stat_result]]:
+        for root, _, file_names in os.walk(os.path.realpath(directory)):
+            for file_name in file_names:
+                if file_name.lower().endswith(ARCHIVE_FILE_SUFFIX):
+                    path: str = os.path.join(root, file_name)
+                    try:
+                        yield path, os.stat(path)
+                    except OSError:
+                        continue
+
+    def _legend_id(self, legend_key: str) -> int:
+        # every legend is stored once: there are far fewer legends than curves
+        legend_id: Optional[int] = self._legend_ids.get(legend_key)
+        if legend_id is None:
+            self._connection.execute('INSERT OR IGNORE INTO legends (legend_key) VALUES (?)', (legend_key,))
+            legend_id = self._legend_ids[legend_key] = self._connection.execute(
+                'SELECT id FROM legends WHERE legend_key = ?', (legend_key,)).fetchone()[0]
+        return legend_id
+
+    def _store(self, path: str, stat: os.stat_result):
+        # the curve data are skipped, not parsed
+        header: IRTECONHeader = IRTECONHeader()
+        axes: List[IRTECONAxis] = []
+        curves: List[IRTECONCurve] = []
+        error: Optional[str] = None
+        try:
+            for item in iter_irtecon_file(path):
+                if isinstance(item, IRTECONHeader):
+                    header = item
+                elif isinstance(item, IRTECONAxis):
+                    axes.append(item)
+                elif isinstance(item, IRTECONCurve):
+                    curves.append(item)
+        except Exception as ex:
+            # whatever is wrong with the file, keep what has been read, and don't read the file again until it changes
+            error = getattr(ex, 'strerror', None) or str(ex)
+        self._connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        file_id: int = self._connection.execute(
+            'INSERT INTO files (path, mtime, size, program, configuration_file, sample_name, error) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (path, stat.st_mtime_ns, stat.st_size,
+             header.program, header.configuration_file, header.sample_name, error)).lastrowid
+        self._connection.executemany('INSERT INTO axes (file, axis, name, unit, min, max) VALUES (?, ?, ?, ?, ?, ?)',
+                                     [(file_id, axis.axis, axis.name, axis.unit, axis.min, axis.max)
+                                      for axis in axes])
+        self._connection.executemany('INSERT INTO curves (file, number, time, duration, legend) VALUES (?, ?, ?, ?, ?)',
+                                     [(file_id, number, curve.time.isoformat(timespec='seconds'),
+                                       curve.duration, self._legend_id(curve.legend_key))
+                                      for number, curve in enumerate(curves)])
+
+    def update(self, directory: str, is_cancelled: Callable[[], bool] = lambda: False,
+               progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int]:
+        # index the files new or changed, forget the files gone; return the numbers of both
+        # `progress` gets the number of the files indexed so far and the number of the files to index
+        indexed_files: Dict[str, Tuple[int, int]] = self._indexed_files(directory)
+        changed: List[Tuple[str, os.stat_result]] = []
+        found: set = set()
+        for path, stat in self._walk(directory):
+            if is_cancelled():
+                return 0, 0
+            found.add(path)
+            if indexed_files.get(path) != (stat.st_mtime_ns, stat.st_size):
+                changed.append((path, stat))
+        gone: List[str] = [path for path in indexed_files if path not in found]
+        with self._connection:
+            self._connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in gone])
+        files_done: int = 0
+        try:
+            for path, stat in changed:
+                if is_cancelled():
+                    break
+                self._store(path, stat)
+                files_done += 1
+                if files_done % self.COMMIT_FILES == 0:
+                    self._connection.commit()
+                if progress is not None:
+                    progress(files_done, len(changed))
+        finally:
+            self._connection.commit()
+        return files_done, len(gone)
+
+    def find(self, start: Optional[datetime] = None, stop: Optional[datetime] = None, legend_pattern: str = '',
+             text: str = '', directory: str = '', limit: int = DEFAULT_LIMIT) -> List['ArchiveIndex.Entry']:
+        # the curves recorded from `start` to `stop`, both included, the earliest first;
+        # the legend is matched with a case-sensitive shell-style pattern,
+        # and the text is looked for in the sample name, the program, the configuration file, and the path
+        conditions: List[str] = []
+        parameters: List = []
+        if start is not None:
+            conditions.append('time >= ?')
+            parameters.append(start.isoformat(timespec='seconds'))
+        if stop is not None:
+            conditions.append('time <= ?')
+            parameters.append(stop.isoformat(timespec='seconds'))
+        if legend_pattern:
+            # match the legends, not the curves
+            conditions.append('legend IN (SELECT id FROM legends WHERE legend_key GLOB ?)')
+            parameters.append(legend_pattern)
+        file_conditions: List[str] = []
+        if text:
+            file_conditions.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '!'" for column
+                                                     in ('sample_name', 'program', 'configuration_file', 'path'))
+                                   + ')')
+            parameters.extend(['%' + text.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'] * 4)
+        if directory:
+            file_conditions.append('path >= ? AND path < ?')
+            parameters.extend(self._directory_range(directory))
+        if file_conditions:
+            conditions.append('file IN (SELECT id FROM files WHERE ' + ' AND '.join(file_conditions) + ')')
+        # find the curves first, then join the few found with their files and legends
+        query: str = 'SELECT file, number, time, duration, legend FROM curves'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query = ('SELECT files.path, found.number, found.time, found.duration, legends.legend_key, files.sample_name '
+                 f'FROM ({query} ORDER BY time LIMIT ?) AS found '
+                 'JOIN files ON found.file = files.id JOIN legends ON found.legend = legends.id ORDER BY found.time')
+        parameters.append(limit)
+        return [self.Entry(path, number, datetime.fromisoformat(time), duration, legend_key, sample_name)
+                for path, number, time, duration, legend_key, sample_name
+                in self._connection.execute(query, parameters)]
@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import gc
+import json
+import locale
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile, IRTECONHeader, MONTHS, iter_irtecon_file, \
+    parse_date, parse_dates, write_irtecon_curve, write_irtecon_header
+from archive_index import ArchiveIndex
+from curve_catalog import CurveCatalog
+from plain_text_file import PlainTextFile, PlainTextImportSettings, sniff_file
+
+# the unit and the name of the axes of the synthetic files, the first one being x
+AXES_NAMES: Tuple[Tuple[str, str], ...] = (('', 'Frequency'), ('V', 'Voltage signal'), ('A', 'Current'))
+MB: float = 1e6
+# the number of the copies of the synthetic file to put into a curve catalog
+CATALOG_FILES: int = 1000
+# the number of the files of the synthetic archive, and of the curves in every one of them
+ARCHIVE_FILES: int = 1000
+ARCHIVE_CURVES: int = 100
+
+# the name of a measurement, its value, and its unit
+Result = Tuple[str, float, str]
+# the units of the measurements that are better when greater
+THROUGHPUT_UNITS: Tuple[str, ...] = ('MB/s', 'dates/s', 'axes/s', 'files/s')
+
+# run in a new process the way `main.main` starts, printing when the modules get imported,
+# when the window gets painted, and when the first curve of the files given gets plotted;
+# the settings and the cache are kept in the directory given, not with the ones of the user
+STARTUP_SCRIPT: str = '''
+import os
+import sys
+import time
+sys.path.insert(0, sys.argv[1])
+from PyQt5.QtCore import QSettings, QThreadPool
+from PyQt5.QtWidgets import QApplication
+application = QApplication(sys.argv[:1])
+import main
+times = [time.time()]
+settings = QSettings(os.path.join(sys.argv[2], 'settings.ini'), QSettings.IniFormat)
+settings.setValue('cache/directory', os.path.join(sys.argv[2], 'cache'))
+window = main.MainWindow(settings)
+window.show()
+while window.windowHandle() is None or not window.windowHandle().isExposed():
+    application.processEvents()
+application.processEvents()
+times.append(time.time())
+window.open_files(sys.argv[3:])
+while not any(sub_window.widget().curves for sub_window in window.mdiArea.subWindowList()):
+    application.processEvents()
+times.append(time.time())
+print(*times)
+# let the rest of the files load before the directory is removed
+QThreadPool.globalInstance().waitForDone()
+'''
+
+
+def synthetic_curve(rows: int, columns: int, number: int, rng: np.random.Generator) -> np.ndarray:
+    # a sweep in x and noisy sines of it, a bit different for every curve
+    x: np.ndarray = np.linspace(0., 100., rows)
+    values: List[np.ndarray] = [x]
+    for column in range(1, columns):
+        values.append(np.sin(x * (0.05 * column + 0.001 * number)) * 10. ** column + rng.normal(0., 0.01, rows))
+    return np.column_stack(values)
+
+
+def _synthetic_axes(columns: int) -> List[IRTECONAxis]:
+    axes: List[IRTECONAxis] = []
+    for column in range(columns):
+        axis: IRTECONAxis = IRTECONAxis()
+        axis.axis = column + 2
+        axis.unit, axis.name = AXES_NAMES[column] if column < len(AXES_NAMES) else ('', f'Column {column + 1}')
+        axis.min, axis.max = (0., 100.) if not column else (-10. ** column, 10. ** column)
+        axes.append(axis)
+    return axes
+
+
+def write_synthetic_grd(file_name: str, curves: int = 20, rows: int = 20000, columns: int = 3,
+                        decimal_comma: bool = True, seed: int = 0):
+    rng: np.random.Generator = np.random.default_rng(seed)
+    header: IRTECONHeader = IRTECONHeader()
+    header.program = 'IRTECON 2.1'
+    header.configuration_file = 'synthetic.cfg'
+    header.sample_name = f'{curves} curves of {rows} rows'
+    start: datetime = datetime(2019, 3, 1, 12)
+    with open(file_name, 'wt', encoding=locale.getpreferredencoding(False)) as file:
+        write_irtecon_header(file, header, _synthetic_axes(columns), decimal_comma)
+        for number in range(curves):
+            curve: IRTECONCurve = IRTECONCurve()
+            curve.time = start + timedelta(minutes=number)
+            curve.duration = 50.
+            curve.legend_key = f'run {number + 1}'
+            curve.data = synthetic_curve(rows, columns, number, rng)
+            write_irtecon_curve(file, number + 1, curve, decimal_comma)
+
+
+def write_synthetic_csv(file_name: str, rows: int = 400000, columns: int = 3, decimal_comma: bool = False,
+                        seed: int = 0):
+    # with the decimal comma, the values are separated with semicolons
+    rng: np.random.Generator = np.random.default_rng(seed)
+    separator: str = ';' if decimal_comma else ','
+    axes: List[IRTECONAxis] = _synthetic_axes(columns)
+    line_format: str = separator.join(['%.9g'] * columns) + '\n'
+    with open(file_name, 'wt', encoding=locale.getpreferredencoding(False)) as file:
+        file.write(separator.join(axis.name for axis in axes) + '\n')
+        file.write(separator.join(axis.unit for axis in axes) + '\n')
+        data: np.ndarray = synthetic_curve(rows, columns, 0, rng)
+        for start in range(0, rows, 1 << 14):
+            block: np.ndarray = data[start:start + (1 << 14)]
+            lines: str = (line_format * block.shape[0]) % tuple(block.ravel().tolist())
+            file.write(lines.replace('.', ',') if decimal_comma else lines)
+
+
+def _best_time(function: Callable[[], Any], repeat: int) -> float:
+    best: float = np.inf
+    for _ in range(repeat):
+        gc.collect()
+        start: float = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(function: Callable[[], Any]) -> int:
+    # a separate run, for the tracing slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_parsing(grd_file_name: str, csv_file_name: str, repeat: int = 3) -> List[Result]:
+    results: List[Result] = []
+
+    def parse_grd():
+        for curve in IRTECONFile.from_file(grd_file_name).curves:
+            curve.load()
+
+    def parse_first_curve():
+        for item in iter_irtecon_file(grd_file_name):
+            if isinstance(item, IRTECONCurve):
+                item.load()
+                return
+
+    grd_size: int = os.path.getsize(grd_file_name)
+    results.append(('grd parse', grd_size / MB / _best_time(parse_grd, repeat), 'MB/s'))
+    results.append(('grd parse peak memory', _peak_memory(parse_grd) / MB, 'MB'))
+    results.append(('grd time to first curve', _best_time(parse_first_curve, repeat) * 1e3, 'ms'))
+
+    dates: List[str] = [f'{12 + n % 12:02d}:{n % 60:02d}:{n % 59:02d} {1 + n % 28:02d}-{MONTHS[n % 12]}-{2000 + n % 25}'
+                        for n in range(100000)]
+    results.append(('parse_date', len(dates) / _best_time(lambda: [parse_date(date) for date in dates], repeat),
+                    'dates/s'))
+    results.append(('parse_dates', len(dates) / _best_time(lambda: parse_dates(dates), repeat), 'dates/s'))
+    axis_lines: List[str] = [f'  {2 + n % 3} -{n},5 {n},25 1 1 1 1 1 1 V Voltage signal' for n in range(100000)]
+    results.append(('IRTECONAxis', len(axis_lines) / _best_time(lambda: [IRTECONAxis(line) for line in axis_lines],
+                                                                 repeat),
+                    'axes/s'))
+
+    # as if the file were one of many in an archive
+    curves: List[IRTECONCurve] = IRTECONFile.from_file(grd_file_name).curves
+    catalog: CurveCatalog = CurveCatalog()
+
+    def build_catalog():
+        catalog.clear()
+        for number in range(CATALOG_FILES):
+            catalog.add_curves(f'{number}.grd', curves)
+        catalog.find(stop=datetime.min)
+
+    results.append(('catalog build', _best_time(build_catalog, repeat) * 1e3, 'ms'))
+    results.append(('catalog query', _best_time(lambda: catalog.find(curves[0].time, curves[-1].time, 'run 1*'),
+                                                repeat) * 1e3, 'ms'))
+
+    csv_size: int = os.path.getsize(csv_file_name)
+    results.append(('csv sniff', _best_time(lambda: sniff_file(csv_file_name), repeat) * 1e3, 'ms'))
+    settings: PlainTextImportSettings = sniff_file(csv_file_name)
+    results.append(('csv parse', csv_size / MB / _best_time(lambda: PlainTextFile(csv_file_name, settings), repeat),
+                    'MB/s'))
+    results.append(('csv parse peak memory', _peak_memory(lambda: PlainTextFile(csv_file_name, settings)) / MB, 'MB'))
+    return results
+
+
+def benchmark_archive(directory: str, repeat: int = 3) -> List[Result]:
+    # many short files, as a measurement archive has
+    results: List[Result] = []
+    archive_directory: str = os.path.join(directory, 'archive')
+    os.makedirs(archive_directory, exist_ok=True)
+    write_synthetic_grd(os.path.join(archive_directory, '0.grd'), ARCHIVE_CURVES, 10)
+    for number in range(1, ARCHIVE_FILES):
+        shutil.copyfile(os.path.join(archive_directory, '0.grd'), os.path.join(archive_directory, f'{number}.grd'))
+    index_file_name: str = os.path.join(directory, 'archive.sqlite3')
+    index: Optional[ArchiveIndex] = None
+
+    def build_index():
+        nonlocal index
+        if index is not None:
+            index.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(index_file_name + suffix):
+                os.remove(index_file_name + suffix)
+        index = ArchiveIndex(index_file_name)
+        index.update(archive_directory)
+
+    try:
+        results.append(('archive index', ARCHIVE_FILES / _best_time(build_index, repeat), 'files/s'))
+        results.append(('archive update', _best_time(lambda: index.update(archive_directory), repeat) * 1e3, 'ms'))
+        results.append(('archive query', _best_time(lambda: index.find(legend_pattern='run 1?', text='curves'),
+                                                    repeat) * 1e3, 'ms'))
+    finally:
+        if index is not None:
+            index.close()
+    return results
+
+
+def benchmark_plotting(grd_file_name: str, repeat: int = 3) -> List[Result]:
+    # Qt gets imported only here, so that the parsing can be measured without it
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    application: QApplication = QApplication.instance() or QApplication(sys.argv[:1])
+    from pyqtchild import MDIChildPlot
+
+    results: List[Result] = []
+
+    first_curve_times: List[float] = []
+    load_times: List[float] = []
+    for _ in range(repeat):
+        plot: MDIChildPlot = MDIChildPlot()
+        plot.resize(800, 600)
+        plot.show()
+        application.processEvents()
+        start: float = time.perf_counter()
+        plot.load_irtecon_file(grd_file_name)
+        while not plot.curves and plot.is_loading:
+            application.processEvents()
+        first_curve_times.append(time.perf_counter() - start)
+        while plot.is_loading:
+            application.processEvents()
+        load_times.append(time.perf_counter() - start)
+        plot.close()
+        application.processEvents()
+    results.append(('plot time to first curve', min(first_curve_times) * 1e3, 'ms'))
+    results.append(('plot load', min(load_times), 's'))
+
+    file_data: IRTECONFile = IRTECONFile.from_file(grd_file_name)
+    for curve in file_data.curves:
+        curve.load()
+    insert_times: List[float] = []
+    plot = MDIChildPlot()
+    for _ in range(repeat):
+        plot.close()
+        plot = MDIChildPlot()
+        plot.resize(800, 600)
+        plot.show()
+        application.processEvents()
+        start = time.perf_counter()
+        plot.add_irtecon_file(grd_file_name, file_data)
+        application.processEvents()
+        insert_times.append(time.perf_counter() - start)
+    results.append(('plot insert', min(insert_times) * 1e3, 'ms'))
+    results.append(('plot redraw', _best_time(plot.grab, repeat) * 1e3, 'ms'))
+
+    def zoom():
+        plot.plotItem.vb.scaleBy((0.5, 1.))
+        plot.grab()
+        plot.plotItem.vb.scaleBy((2., 1.))
+        plot.grab()
+
+    results.append(('plot zoom and redraw', _best_time(zoom, repeat) / 2 * 1e3, 'ms'))
+    plot.close()
+    application.processEvents()
+    return results
+
+
+def benchmark_startup(grd_file_name: str, repeat: int = 3) -> List[Result]:
+    # the times since the process is launched, every time with no settings and an empty cache
+    environment: Dict[str, str] = dict(os.environ)
+    environment.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    best_times: List[float] = [np.inf] * 3
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            start: float = time.time()
+            output: str = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT,
+                                          os.path.dirname(os.path.abspath(__file__)), directory, grd_file_name],
+                                         env=environment, stdout=subprocess.PIPE, check=True,
+                                         universal_newlines=True).stdout
+        best_times = [min(best_time, float(stage_time) - start)
+                      for best_time, stage_time in zip(best_times, output.split())]
+    return [('startup imports', best_times[0] * 1e3, 'ms'),
+            ('startup window painted', best_times[1] * 1e3, 'ms'),
+            ('startup first curve', best_times[2] * 1e3, 'ms')]
+
+
+def print_results(results: Sequence[Result], baseline: Optional[Dict[str, Tuple[float, str]]] = None,
+                  file=sys.stdout):
+    for name, value, unit in results:
+        line: str = f'{name:<28} {value:12.3f} {unit:<8}'
+        if baseline is not None and name in baseline and baseline[name][1] == unit and baseline[name][0]:
+            ratio: float = value / baseline[name][0]
+            if unit not in THROUGHPUT_UNITS:
+                ratio = 1. / ratio if ratio else np.inf
+            # above 1 is an improvement either way
+            line += f' {baseline[name][0]:12.3f}  ×{ratio:.2f}'
+        print(line, file=file)
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Measure how fast synthetic IRTECON and CSV files get parsed and plotted.')
+    parser.add_argument('-c', '--curves', type=int, default=20, help='the number of the curves in the .grd file')
+    parser.add_argument('-r', '--rows', type=int, default=20000,
+                        help='the number of the rows of a curve; the CSV file has as many rows as all the curves')
+    parser.add_argument('-n', '--columns', type=int, default=3, help='the number of the columns, x included')
+    parser.add_argument('--decimal', choices=('comma', 'point'), default='comma',
+                        help='the decimal separator of the numbers written')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of the runs to take the best of')
+    parser.add_argument('-d', '--directory',
+                        help='where to write the files and keep them; a temporary directory by default')
+    parser.add_argument('--generate-only', action='store_true', help='only write the files')
+    parser.add_argument('--no-gui', action='store_true', help='skip plotting')
+    parser.add_argument('-s', '--save', metavar='FILE', help='save the results as a baseline to compare to later')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with a saved baseline')
+    arguments: argparse.Namespace = parser.parse_args(args)
+    if arguments.curves < 1 or arguments.rows < 2 or arguments.columns < 2 or arguments.repeat < 1:
+        parser.error('there must be a curve, two rows, two columns, and a run at least')
+    if arguments.generate_only and not arguments.directory:
+        parser.error('--generate-only needs --directory')
+
+    settings: Dict[str, Any] = {key: value for key, value in vars(arguments).items()
+                                if key in ('curves', 'rows', 'columns', 'decimal', 'repeat')}
+    baseline: Optional[Dict[str, Tuple[float, str]]] = None
+    if arguments.compare:
+        try:
+            with open(arguments.compare, 'rt') as file:
+                saved: Dict[str, Any] = json.load(file)
+            baseline = {name: (value, unit) for name, value, unit in saved['results']}
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            parser.error(f'cannot read {arguments.compare}: {getattr(ex, "strerror", None) or ex}')
+        if saved.get('settings') != settings:
+            print(f'the baseline was taken with other settings: {saved.get("settings")}', file=sys.stderr)
+
+    temporary_directory: Optional[tempfile.TemporaryDirectory] = None
+    directory: str
+    if arguments.directory:
+        directory = arguments.directory
+        os.makedirs(directory, exist_ok=True)
+    else:
+        temporary_directory = tempfile.TemporaryDirectory(prefix='combiner-benchmark-')
+        directory = temporary_directory.name
+    try:
+        decimal_comma: bool = arguments.decimal == 'comma'
+        grd_file_name: str = os.path.join(directory, 'synthetic.grd')
+        csv_file_name: str = os.path.join(directory, 'synthetic.csv')
+        start: float = time.perf_counter()
+        write_synthetic_grd(grd_file_name, arguments.curves, arguments.rows, arguments.columns, decimal_comma)
+        write_synthetic_csv(csv_file_name, arguments.curves * arguments.rows, arguments.columns, decimal_comma)
+        print(f'{grd_file_name}: {os.path.getsize(grd_file_name) / MB:.1f} MB, '
+              f'{csv_file_name}: {os.path.getsize(csv_file_name) / MB:.1f} MB, '
+              f'written in {time.perf_counter() - start:.1f} s', file=sys.stderr)
+        if arguments.generate_only:
+            return 0
+
+        results: List[Result] = benchmark_parsing(grd_file_name, csv_file_name, arguments.repeat)
+        results += benchmark_archive(directory, arguments.repeat)
+        if not arguments.no_gui:
+            results += benchmark_startup(grd_file_name, arguments.repeat)
+            results += benchmark_plotting(grd_file_name, arguments.repeat)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if temporary_directory is not None:
+            temporary_directory.cleanup()
+
+    print_results(results, baseline)
+    if arguments.save:
+        with open(arguments.save, 'wt') as file:
+            json.dump({'time': datetime.now().isoformat(timespec='seconds'),
+                       'python': sys.version.split()[0],
+                       'numpy': np.__version__,
+                       'settings': settings,
+                       'results': results}, file, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import locale
+import sys
+from fnmatch import fnmatchcase
+from functools import partial
+from typing import List, Optional, Sequence, TextIO
+
+from irtecon_file import IRTECONCurve, IRTECONFile, IRTECONHeader, write_irtecon_curve, write_irtecon_header
+from irtecon_pool import iter_irtecon_files
+from plain_text_file import PlainTextFile, parse_range, sniff_file
+
+
+def read_curve_file(file_name: str, curve_ranges: str = '', legend_patterns: Sequence[str] = ()) -> IRTECONFile:
+    # runs in a worker process; only the curves selected are passed back
+    file_data: IRTECONFile
+    if file_name.lower().endswith('.grd'):
+        file_data = IRTECONFile.from_file(file_name)
+    else:
+        file_data = PlainTextFile(file_name, sniff_file(file_name)).to_irtecon_file()
+    if curve_ranges or legend_patterns:
+        indices: List[int] = [index - 1 for index in parse_range(curve_ranges)]
+        file_data.curves = [curve for index, curve in enumerate(file_data.curves)
+                            if index in indices
+                            or any(fnmatchcase(curve.legend_key, pattern) for pattern in legend_patterns)]
+    return file_data
+
+
+def combine(file_names: Sequence[str], output: TextIO, curve_ranges: str = '', legend_patterns: Sequence[str] = (),
+            title: Optional[str] = None, max_workers: Optional[int] = None) -> int:
+    # write the header of the first file read, then the curves selected as the files get parsed;
+    # return the number of the files failed
+    curves_written: int = 0
+    failures: int = 0
+    header_written: bool = False
+    for file_name, file_data in iter_irtecon_files(file_names, max_workers=max_workers, ordered=True,
+                                                   parse=partial(read_curve_file, curve_ranges=curve_ranges,
+                                                                 legend_patterns=legend_patterns)):
+        if isinstance(file_data, Exception):
+            print(f'{file_name}: {getattr(file_data, "strerror", None) or file_data}', file=sys.stderr)
+            failures += 1
+            continue
+        if not header_written:
+            header: IRTECONHeader = next(file_data.items())
+            if title is not None:
+                header.sample_name = title
+            write_irtecon_header(output, header, file_data.axes)
+            header_written = True
+        curve: IRTECONCurve
+        for curve in file_data.curves:
+            curves_written += 1
+            write_irtecon_curve(output, curves_written, curve)
+        output.flush()
+    return failures
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Combine the curves of IRTECON and delimited text files into an IRTECON file.')
+    parser.add_argument('files', nargs='+', metavar='FILE',
+                        help='a .grd file, or a delimited text file to guess the format of')
+    parser.add_argument('-o', '--output', default='-',
+                        help='the file to write, the standard output by default')
+    parser.add_argument('-c', '--curves', default='',
+                        help='the numbers of the curves to take from every file, e.g., 1, 2, 4-6')
+    parser.add_argument('-l', '--legend', action='append', default=[], metavar='PATTERN',
+                        help='take the curves with the legend matching the pattern, e.g., "run 1*"; may repeat')
+    parser.add_argument('-t', '--title', help='the sample name to write instead of the one of the first file')
+    parser.add_argument('-j', '--jobs', type=int, help='the number of the files to parse at once')
+    arguments: argparse.Namespace = parser.parse_args(args)
+    try:
+        parse_range(arguments.curves)
+    except ValueError:
+        parser.error(f'invalid curve numbers: {arguments.curves}')
+
+    output: TextIO
+    if arguments.output == '-':
+        output = sys.stdout
+    else:
+        output = open(arguments.output, 'wt', encoding=locale.getpreferredencoding(False))
+    try:
+        failures: int = combine(arguments.files, output, arguments.curves, arguments.legend,
+                                title=arguments.title, max_workers=arguments.jobs)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import re
+from datetime import datetime
+from fnmatch import translate
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from irtecon_file import IRTECONCurve, IRTECONFile, parse_dates
+
+
+class CurveCatalog:
+    # the time, the duration, and the legend of every curve of many files, to find the curves without the files;
+    # a "file" is any name the curves are added under, such as a file name or a plot;
+    # the rows are kept sorted by time, and every legend is stored once
+    class Entry:
+        def __init__(self, file_name: str, index: int, time: datetime, duration: float, legend_key: str):
+            self.file_name: str = file_name
+            # the index of the curve in the file
+            self.index: int = index
+            self.time: datetime = time
+            self.duration: float = duration
+            self.legend_key: str = legend_key
+
+        def __repr__(self):
+            return 'CurveCatalog.Entry(' + ', '.join(f'{key}={repr(value)}'
+                                                     for key, value in self.__dict__.items()) + ')'
+
+    ROW_TYPE: np.dtype = np.dtype([('time', 'datetime64[s]'), ('duration', float),
+                                   ('file', np.int32), ('index', np.int32), ('legend', np.int32)])
+
+    def __init__(self):
+        self._rows: np.ndarray = np.empty(0, dtype=self.ROW_TYPE)
+        # a contiguous copy of the times of the rows to search
+        self._times: np.ndarray = self._rows['time'].copy()
+        # the rows added since the last query, merged when needed
+        self._pending: List[np.ndarray] = []
+        self._file_names: List[str] = []
+        self._file_numbers: Dict[str, int] = dict()
+        self._legends: List[str] = []
+        self._legend_numbers: Dict[str, int] = dict()
+
+    def __len__(self) -> int:
+        return self._rows.size + sum(rows.size for rows in self._pending)
+
+    @property
+    def file_names(self) -> List[str]:
+        return list(self._file_numbers)
+
+    def _legend_number(self, legend_key: str) -> int:
+        number: Optional[int] = self._legend_numbers.get(legend_key)
+        if number is None:
+            number = self._legend_numbers[legend_key] = len(self._legends)
+            self._legends.append(legend_key)
+        return number
+
+    def add(self, file_name: str, times: Union[np.ndarray, Sequence[str]], durations: Sequence[float],
+            legend_keys: Sequence[str]):
+        # the times are either `datetime64` or the dates as they are written in the files;
+        # the curves of a file added before are replaced
+        self.remove(file_name)
+        if not isinstance(times, np.ndarray) or not np.issubdtype(times.dtype, np.datetime64):
+            times = parse_dates(times)
+        if not (len(times) == len(durations) == len(legend_keys)):
+            raise ValueError('The numbers of the times, the durations, and the legends differ')
+        file_number: int = len(self._file_names)
+        self._file_names.append(file_name)
+        self._file_numbers[file_name] = file_number
+        rows: np.ndarray = np.empty(len(times), dtype=self.ROW_TYPE)
+        rows['time'] = times
+        rows['duration'] = durations
+        rows['file'] = file_number
+        rows['index'] = np.arange(len(times))
+        rows['legend'] = [self._legend_number(legend_key) for legend_key in legend_keys]
+        self._pending.append(rows)
+
+    def add_curves(self, file_name: str, curves: Sequence[IRTECONCurve]):
+        self.add(file_name, np.array([curve.time for curve in curves], dtype='datetime64[s]'),
+                 [curve.duration for curve in curves], [curve.legend_key for curve in curves])
+
+    def add_file(self, file_name: str, file_data: IRTECONFile):
+        self.add_curves(file_name, file_data.curves)
+
+    def remove(self, file_name: str):
+        file_number: Optional[int] = self._file_numbers.pop(file_name, None)
+        if file_number is None:
+            return
+        self._merge()
+        self._rows = self._rows[self._rows['file'] != file_number]
+        self._times = self._rows['time'].copy()
+
+    def clear(self):
+        self._rows = np.empty(0, dtype=self.ROW_TYPE)
+        self._times = self._rows['time'].copy()
+        self._pending = []
+        self._file_names = []
+        self._file_numbers = dict()
+        self._legends = []
+        self._legend_numbers = dict()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        rows: np.ndarray = np.concatenate([self._rows] + self._pending)
+        self._pending = []
+        # the rows of the same time stay in the order they were added
+        self._rows = rows.take(np.argsort(rows['time'], kind='stable'))
+        self._times = self._rows['time'].copy()
+
+    def _legends_matching(self, pattern: str) -> np.ndarray:
+        # whether every legend matches the shell-style pattern; the legends are far fewer than the curves
+        regex: re.Pattern = re.compile(translate(pattern))
+        return np.array([regex.match(legend) is not None for legend in self._legends], dtype=bool)
+
+    def find(self, start: Optional[datetime] = None, stop: Optional[datetime] = None,
+             legend_pattern: str = '') -> List['CurveCatalog.Entry']:
+        # the curves recorded from `start` to `stop`, both included, with the legend matching the pattern, if any
+        self._merge()
+        first: int = 0 if start is None else int(np.searchsorted(self._times, np.datetime64(start, 's'), side='left'))
+        last: int = (self._times.size if stop is None
+                     else int(np.searchsorted(self._times, np.datetime64(stop, 's'), side='right')))
+        rows: np.ndarray = self._rows[first:last]
+        if legend_pattern:
+            rows = rows[self._legends_matching(legend_pattern)[rows['legend']]]
+        return [self.Entry(self._file_names[file_number], index, time, duration, self._legends[legend_number])
+                for time, duration, file_number, index, legend_number in rows.tolist()]
+
+    def find_files(self, start: Optional[datetime] = None, stop: Optional[datetime] = None,
+                   legend_pattern: str = '') -> Dict[str, List[int]]:
+        # the indices of the curves found by the files holding them
+        found: Dict[str, List[int]] = dict()
+        for entry in self.find(start, stop, legend_pattern):
+            found.setdefault(entry.file_name, []).append(entry.index)
+        for indices in found.values():
+            indices.sort()
+        return found
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pyqtgraph import PlotDataItem, ViewBox
+
+
+class MinMaxPyramid:
+    # every level holds the minima and the maxima of `FACTOR` times longer bins of the previous level
+    FACTOR: int = 4
+
+    def __init__(self, x: np.ndarray, y: np.ndarray):
+        if x.size > 1 and x[0] > x[-1]:
+            x = x[::-1]
+            y = y[::-1]
+        self.x: np.ndarray = x
+        self.y: np.ndarray = y
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        y_min: np.ndarray = y
+        y_max: np.ndarray = y
+        while y_min.size > 1:
+            bin_starts: np.ndarray = np.arange(0, y_min.size, self.FACTOR)
+            y_min = np.fmin.reduceat(y_min, bin_starts)
+            y_max = np.fmax.reduceat(y_max, bin_starts)
+            self.levels.append((y_min, y_max))
+
+    @staticmethod
+    def is_applicable(x: np.ndarray) -> bool:
+        # the bins must be contiguous along x
+        if x.size < 2:
+            return False
+        steps: np.ndarray = np.diff(x)
+        return bool(np.all(steps >= 0.) or np.all(steps <= 0.))
+
+    def bounds(self, ax: int) -> Tuple[Optional[float], Optional[float]]:
+        if not self.x.size:
+            return None, None
+        if ax == 0:
+            return float(self.x[0]), float(self.x[-1])
+        y_min, y_max = self.levels[-1] if self.levels else (self.y, self.y)
+        if np.all(np.isnan(y_min)):
+            return None, None
+        return float(np.nanmin(y_min)), float(np.nanmax(y_max))
+
+    def slice(self, x_min: float, x_max: float, bins: int) -> Tuple[np.ndarray, np.ndarray]:
+        # the points within [x_min, x_max] and one more at each side,
+        # reduced to no more than `bins` pairs of a minimum and a maximum
+        start: int = max(int(np.searchsorted(self.x, x_min, side='left')) - 1, 0)
+        stop: int = min(int(np.searchsorted(self.x, x_max, side='right')) + 1, self.x.size)
+        if stop - start <= 2 * bins:
+            return self.x[start:stop], self.y[start:stop]
+        level: int = 0
+        bin_size: int = self.FACTOR
+        while (stop - start) / bin_size > bins and level + 1 < len(self.levels):
+            level += 1
+            bin_size *= self.FACTOR
+        y_min, y_max = self.levels[level]
+        bin_start: int = start // bin_size
+        bin_stop: int = -(-stop // bin_size)
+        return (np.repeat(self.x[bin_start * bin_size:bin_stop * bin_size:bin_size], 2),
+                np.column_stack((y_min[bin_start:bin_stop], y_max[bin_start:bin_stop])).ravel())
+
+
+class LODPlotDataItem(PlotDataItem):
+    # draw only as many points as the view can show, taking them from a min/max pyramid
+    MIN_POINTS_TO_DECIMATE: int = 4096
+    DEFAULT_PIXELS: int = 1024
+
+    def __init__(self, data: np.ndarray, **kwargs):
+        self.source_data: np.ndarray = data
+        self._pyramid: Optional[MinMaxPyramid] = None
+        self._shown_slice: Optional[Tuple[float, float, int]] = None
+        if data.ndim == 2 and data.shape[0] >= self.MIN_POINTS_TO_DECIMATE \
+                and MinMaxPyramid.is_applicable(data[:, 0]):
+            self._pyramid = MinMaxPyramid(data[:, 0], data[:, 1])
+            super(LODPlotDataItem, self).__init__(**kwargs)
+            self.update_lod()
+        else:
+            super(LODPlotDataItem, self).__init__(data, **kwargs)
+
+    def update_lod(self):
+        if self._pyramid is None:
+            return
+        vb = self.getViewBox()
+        if vb is None:
+            x_min, x_max = self._pyramid.bounds(0)
+            pixels: int = self.DEFAULT_PIXELS
+        else:
+            (x_min, x_max), _ = vb.viewRange()
+            pixels = int(vb.width()) or self.DEFAULT_PIXELS
+        if self._shown_slice == (x_min, x_max, pixels):
+            return
+        self._shown_slice = (x_min, x_max, pixels)
+        x, y = self._pyramid.slice(x_min, x_max, pixels)
+        self.setData(x=x, y=y)
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        if self._pyramid is None:
+            return super(LODPlotDataItem, self).dataBounds(ax, frac, orthoRange)
+        # the displayed points are clipped to the view, but the view has to fit the whole curve
+        return self._pyramid.bounds(ax)
+
+    def viewRangeChanged(self, *args, **kwargs):
+        super(LODPlotDataItem, self).viewRangeChanged(*args, **kwargs)
+        self.update_lod()
+
+    def viewTransformChanged(self):
+        super(LODPlotDataItem, self).viewTransformChanged()
+        self.update_lod()
+
+
+def _finite_bounds(bounds: Optional[Tuple[Optional[float], Optional[float]]]) -> Optional[Tuple[float, float]]:
+    if bounds is None or bounds[0] is None or bounds[1] is None \
+            or not math.isfinite(bounds[0]) or not math.isfinite(bounds[1]):
+        return None
+    return bounds[0], bounds[1]
+
+
+class BoundsCachingViewBox(ViewBox):
+    # the bounds of the curves are taken once, when the curves are added, not on every autorange;
+    # the curves must keep their data and their place in the view as long as they are in it
+    def __init__(self, *args, **kwargs):
+        super(BoundsCachingViewBox, self).__init__(*args, **kwargs)
+        # x bounds, y bounds, and the pixels the curve is drawn beyond them
+        self._item_bounds: Dict[LODPlotDataItem,
+                                Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]], float]] = dict()
+
+    def addItem(self, item, ignoreBounds=False):
+        if not ignoreBounds and isinstance(item, LODPlotDataItem):
+            self._item_bounds[item] = (_finite_bounds(item.dataBounds(0)), _finite_bounds(item.dataBounds(1)),
+                                       item.pixelPadding())
+        super(BoundsCachingViewBox, self).addItem(item, ignoreBounds=ignoreBounds)
+
+    def removeItem(self, item):
+        self._item_bounds.pop(item, None)
+        super(BoundsCachingViewBox, self).removeItem(item)
+
+    def childrenBounds(self, frac=None, orthoRange=(None, None), items=None):
+        # the bounds of a part of the curves, or of the curves within a range, are not cached
+        if items is not None or (frac is not None and tuple(frac) != (1.0, 1.0)) \
+                or orthoRange[0] is not None or orthoRange[1] is not None:
+            return super(BoundsCachingViewBox, self).childrenBounds(frac=frac, orthoRange=orthoRange, items=items)
+        other_items: List = [item for item in self.addedItems if item not in self._item_bounds]
+        ranges: List[Optional[List[float]]]
+        if other_items:
+            ranges = super(BoundsCachingViewBox, self).childrenBounds(items=other_items)
+        else:
+            ranges = [None, None]
+        visible_bounds: List[Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]], float]] = \
+            [bounds for item, bounds in self._item_bounds.items() if item.isVisible()]
+        for ax in (0, 1):
+            for bounds in visible_bounds:
+                if bounds[ax] is None:
+                    continue
+                if ranges[ax] is None:
+                    ranges[ax] = list(bounds[ax])
+                else:
+                    ranges[ax] = [min(ranges[ax][0], bounds[ax][0]), max(ranges[ax][1], bounds[ax][1])]
+        # make room for the width of the lines, as `ViewBox.childrenBounds` does
+        for ax, size in ((0, self.width()), (1, self.height())):
+            if size <= 0 or ranges[ax] is None:
+                continue
+            pixel_size: float = (ranges[ax][1] - ranges[ax][0]) / size
+            for bounds in visible_bounds:
+                if bounds[2] and bounds[ax] is not None:
+                    ranges[ax][0] = min(ranges[ax][0], bounds[ax][0] - bounds[2] * pixel_size)
+                    ranges[ax][1] = max(ranges[ax][1], bounds[ax][1] + bounds[2] * pixel_size)
+        return ranges
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# the curves are combined column by column: the first column of the data is x, the rest are the values;
+# only the columns all the curves have are combined
+MERGE_MODES: Tuple[str, ...] = ('sum', 'average', 'concatenate')
+MAX_GRID_POINTS: int = 1 << 24
+
+
+def sorted_curve(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # return x ascending and the values matching it, without the points of no x;
+    # the data are copied only if they are not sorted already
+    x: np.ndarray = data[:, 0]
+    y: np.ndarray = data[:, 1:]
+    if x.size > 1:
+        steps: np.ndarray = np.diff(x)
+        if np.all(steps <= 0.) and not np.all(steps == 0.):
+            return x[::-1], y[::-1]
+        if not np.all(steps >= 0.):
+            order: np.ndarray = np.argsort(x, kind='stable')
+            x = x[order]
+            y = y[order]
+    if x.size and np.isnan(x[-1]):
+        # NaN go last after sorting
+        valid: int = int(np.searchsorted(np.isnan(x), True))
+        x = x[:valid]
+        y = y[:valid]
+    return x, y
+
+
+def common_grid(curves: Iterable[np.ndarray], points: Optional[int] = None) -> np.ndarray:
+    # the grid spanning all the curves, as dense as the densest of them unless the number of points is given;
+    # if no curve has a step, the grid is the x of all of them
+    x_min: float = np.inf
+    x_max: float = -np.inf
+    step: float = np.inf
+    # the x of the curves of a single x
+    single_x: List[float] = []
+    for data in curves:
+        if data.ndim != 2 or data.shape[0] < 1:
+            continue
+        curve_min: float = float(np.nanmin(data[:, 0]))
+        curve_max: float = float(np.nanmax(data[:, 0]))
+        if np.isnan(curve_min):
+            continue
+        x_min = min(x_min, curve_min)
+        x_max = max(x_max, curve_max)
+        if data.shape[0] > 1 and curve_max > curve_min:
+            step = min(step, (curve_max - curve_min) / (data.shape[0] - 1))
+        else:
+            single_x.append(curve_min)
+    if x_min > x_max:
+        return np.empty(0)
+    if points is None:
+        if not np.isfinite(step):
+            return np.unique(single_x)
+        points = int(np.ceil((x_max - x_min) / step)) + 1
+    return np.linspace(x_min, x_max, min(points, MAX_GRID_POINTS))
+
+
+def _interpolate_within(x: np.ndarray, y: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # the `grid` points must lie within `x`
+    if x.size == 1:
+        return np.repeat(y[:1], grid.size, axis=0)
+    # guess the points of `x` around the `grid` points as if `x` were uniform,
+    # then look up the ones missed, only them, with a binary search
+    right: np.ndarray
+    if x[-1] > x[0]:
+        right = ((grid - x[0]) * ((x.size - 1) / (x[-1] - x[0]))).astype(np.intp) + 1
+        np.clip(right, 1, x.size - 1, out=right)
+    else:
+        right = np.full(grid.size, x.size - 1)
+    x0: np.ndarray = x.take(right - 1)
+    x1: np.ndarray = x.take(right)
+    missed: np.ndarray = np.flatnonzero((x0 > grid) | ((x1 <= grid) & (right < x.size - 1)))
+    if missed.size > grid.size // 2:
+        right = np.clip(np.searchsorted(x, grid, side='right'), 1, x.size - 1)
+        x0 = x.take(right - 1)
+        x1 = x.take(right)
+    elif missed.size:
+        right[missed] = np.clip(np.searchsorted(x, grid[missed], side='right'), 1, x.size - 1)
+        x0[missed] = x.take(right[missed] - 1)
+        x1[missed] = x.take(right[missed])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights: np.ndarray = np.where(x1 > x0, (grid - x0) / (x1 - x0), 1.)
+    y0: np.ndarray = y[right - 1]
+    if y.ndim > 1:
+        weights = weights[:, np.newaxis]
+    return y0 + weights * (y[right] - y0)
+
+
+class CurveMerger:
+    # add the curves one by one; only the grid-sized result and counters are kept, not the curves
+    CHUNK_POINTS: int = 1 << 16
+
+    def __init__(self, grid: np.ndarray, mode: str = 'sum'):
+        if mode not in MERGE_MODES:
+            raise ValueError(f'Unknown merge mode: {mode}')
+        self.grid: np.ndarray = grid
+        self.mode: str = mode
+        self._values: Optional[np.ndarray] = None
+        # how many curves cover every point of the grid
+        self._counts: Optional[np.ndarray] = None
+        self.curve_count: int = 0
+
+    def add(self, data: np.ndarray):
+        if data.ndim != 2 or data.shape[1] < 2:
+            raise ValueError('No values to combine')
+        x, y = sorted_curve(data)
+        # the binary search runs over the x many times
+        x = np.ascontiguousarray(x)
+        if self._values is None:
+            self._values = np.zeros((self.grid.size, y.shape[1]))
+            self._counts = np.zeros((self.grid.size, y.shape[1]), dtype=np.int64)
+        columns: int = min(y.shape[1], self._values.shape[1])
+        if columns < self._values.shape[1]:
+            self._values = self._values[:, :columns]
+            self._counts = self._counts[:, :columns]
+        y = y[:, :columns]
+        self.curve_count += 1
+        if not x.size:
+            return
+        # the temporary arrays are no longer than a chunk
+        start: int = int(np.searchsorted(self.grid, x[0], side='left'))
+        stop: int = int(np.searchsorted(self.grid, x[-1], side='right'))
+        for chunk_start in range(start, stop, self.CHUNK_POINTS):
+            chunk: slice = slice(chunk_start, min(chunk_start + self.CHUNK_POINTS, stop))
+            chunk_values: np.ndarray = _interpolate_within(x, y, self.grid[chunk])
+            covered: np.ndarray = ~np.isnan(chunk_values)
+            if self.mode == 'concatenate':
+                # the first curve covering a point keeps it
+                covered &= self._counts[chunk] == 0
+                np.copyto(self._values[chunk], chunk_values, where=covered)
+            else:
+                np.add(self._values[chunk], chunk_values, out=self._values[chunk], where=covered)
+            self._counts[chunk] += covered
+
+    def result(self) -> np.ndarray:
+        # x and the combined values, NaN where no curve is
+        if self._values is None:
+            return np.empty((0, 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.mode == 'average':
+                values: np.ndarray = self._values / self._counts
+            else:
+                values = np.where(self._counts > 0, self._values, np.nan)
+        return np.column_stack((self.grid, values))
+
+
+def merge_curves(curves: Sequence[np.ndarray], mode: str = 'sum', grid: Optional[np.ndarray] = None) -> np.ndarray:
+    # without a grid, the curves are passed twice: to find the grid, then to combine them;
+    # with one, any iterable of the curves will do, even a generator reading them one by one
+    if grid is None:
+        grid = common_grid(curves)
+    merger: CurveMerger = CurveMerger(grid, mode)
+    for data in curves:
+        merger.add(data)
+    return merger.result()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+from collections import Counter
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from irtecon_file import IRTECONCurve
+
+# the real path, the modification time, and the size of the source file, and the index of the curve in it;
+# the curves of no known file get an empty path and the address of their data instead of the index
+CurveKey = Tuple[str, int, int, int]
+
+
+def _data_address(data: np.ndarray) -> int:
+    return data.__array_interface__['data'][0]
+
+
+class CurveStore:
+    # the curve data of all the plots; the plots showing the same curve share one array,
+    # and the array is dropped when the last plot showing it lets it go
+    class Entry:
+        def __init__(self, data: np.ndarray):
+            self.data: np.ndarray = data
+            self.owners: Counter = Counter()
+
+        def __repr__(self):
+            return 'CurveStore.Entry(' + ', '.join(f'{key}={repr(value)}'
+                                                   for key, value in self.__dict__.items()) + ')'
+
+    def __init__(self):
+        self._entries: Dict[CurveKey, CurveStore.Entry] = dict()
+        # the keys by the address of the data, to know the views handed out
+        self._keys: Dict[int, CurveKey] = dict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _file_key(file_name: str) -> Optional[Tuple[str, int, int]]:
+        try:
+            path: str = os.path.realpath(file_name)
+            stat: os.stat_result = os.stat(path)
+        except OSError:
+            return None
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def share(self, curve: IRTECONCurve, owner: Hashable, file_name: str = '', index: int = -1):
+        # replace the data of the curve with the stored ones if the curve is known, store the data otherwise
+        if not curve.data.size:
+            return
+        key: Optional[CurveKey] = self._keys.get(_data_address(curve.data))
+        if key is None and file_name and index >= 0:
+            file_key: Optional[Tuple[str, int, int]] = self._file_key(file_name)
+            if file_key is not None:
+                key = file_key + (index,)
+        if key is None:
+            key = ('', 0, 0, _data_address(curve.data))
+        entry: Optional[CurveStore.Entry] = self._entries.get(key)
+        if entry is not None and curve.data is not entry.data and curve.data.shape != entry.data.shape:
+            # the stored data are not those of the curve anymore: keep them for their owners under their address,
+            # so that the owners release them as before, and store the new data under the key
+            old_key: CurveKey = ('', 0, 0, _data_address(entry.data))
+            self._entries[old_key] = self._entries.pop(key)
+            self._keys[_data_address(entry.data)] = old_key
+            entry = None
+        if entry is None:
+            data: np.ndarray = curve.data
+            data.flags.writeable = False
+            entry = self._entries[key] = self.Entry(data)
+            self._keys[_data_address(data)] = key
+        elif curve.data is not entry.data:
+            curve.data = entry.data
+        entry.owners[owner] += 1
+
+    def _drop(self, key: CurveKey):
+        entry: CurveStore.Entry = self._entries.pop(key)
+        if self._keys.get(_data_address(entry.data)) == key:
+            del self._keys[_data_address(entry.data)]
+
+    def release(self, curve: IRTECONCurve, owner: Hashable):
+        if not curve.data.size:
+            return
+        key: Optional[CurveKey] = self._keys.get(_data_address(curve.data))
+        if key is None:
+            return
+        entry: CurveStore.Entry = self._entries[key]
+        entry.owners[owner] -= 1
+        if entry.owners[owner] <= 0:
+            del entry.owners[owner]
+        if not entry.owners:
+            self._drop(key)
+
+    def release_all(self, owner: Hashable):
+        for key, entry in list(self._entries.items()):
+            entry.owners.pop(owner, None)
+            if not entry.owners:
+                self._drop(key)
+
+    def entries(self) -> Iterable[Tuple[CurveKey, 'CurveStore.Entry']]:
+        return self._entries.items()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.data.nbytes for entry in self._entries.values())
+
+    @property
+    def mapped_nbytes(self) -> int:
+        # the data backed by files rather than by memory
+        return sum(entry.data.nbytes for entry in self._entries.values() if isinstance(entry.data, np.memmap))
+
+    @property
+    def shared_nbytes(self) -> int:
+        # the memory the plots would take more should every plot have its own copy of the data
+        return sum(entry.data.nbytes * (sum(entry.owners.values()) - 1) for entry in self._entries.values())
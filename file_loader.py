@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import os
+from typing import Dict, Iterator, List, Optional, Union
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from archive_index import ArchiveIndex
+from irtecon_cache import IRTECONCache
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile, IRTECONHeader, iter_irtecon_file
+from irtecon_pool import iter_irtecon_files
+from load_profiler import profiler
+from plain_text_file import LineIndex, PlainTextFile, PlainTextImportSettings
+
+
+class IRTECONFileLoader(QRunnable):
+    class Signals(QObject):
+        item_loaded: pyqtSignal = pyqtSignal(object)
+        progress: pyqtSignal = pyqtSignal(int)
+        finished: pyqtSignal = pyqtSignal()
+        failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, file_name: str, cache: Optional[IRTECONCache] = None):
+        super(IRTECONFileLoader, self).__init__()
+
+        self.file_name: str = file_name
+        self.cache: Optional[IRTECONCache] = cache
+        self.signals: IRTECONFileLoader.Signals = self.Signals()
+        self._cancelled: bool = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        with profiler.stage('load file'):
+            self._run()
+
+    def _run(self):
+        cached_file_data: Optional[IRTECONFile] = None
+        if self.cache is not None:
+            with profiler.stage('load cache'):
+                cached_file_data = self.cache.load(self.file_name)
+        file_data: IRTECONFile = cached_file_data or IRTECONFile()
+        try:
+            file_size: int = os.path.getsize(self.file_name)
+            items: Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]
+            if cached_file_data is None:
+                items = file_data.collect(iter_irtecon_file(self.file_name))
+            else:
+                items = cached_file_data.items()
+            curves_done: int = 0
+            for item in items:
+                if self._cancelled:
+                    return
+                if isinstance(item, IRTECONCurve):
+                    # parse the data here, not in the GUI thread
+                    item.load()
+                    curves_done += 1
+                    if cached_file_data is None:
+                        self.signals.progress.emit(round(100 * item.span[1] / file_size))
+                    else:
+                        self.signals.progress.emit(round(100 * curves_done / len(cached_file_data.curves)))
+                self.signals.item_loaded.emit(item)
+        except Exception as ex:
+            # nothing is to escape the thread
+            self.signals.failed.emit(getattr(ex, 'strerror', None) or str(ex))
+            return
+        if not self._cancelled:
+            if cached_file_data is None and self.cache is not None:
+                # the file has been loaded already, so a failure to cache it is no failure to load it
+                try:
+                    self.cache.store(self.file_name, file_data)
+                except Exception:
+                    pass
+            self.signals.finished.emit()
+
+
+class IRTECONFilesLoader(QRunnable):
+    class Signals(QObject):
+        file_loaded: pyqtSignal = pyqtSignal(str, object)
+        file_failed: pyqtSignal = pyqtSignal(str, str)
+        progress: pyqtSignal = pyqtSignal(int)
+        finished: pyqtSignal = pyqtSignal()
+
+    def __init__(self, file_names: List[str], cache: Optional[IRTECONCache] = None,
+                 curve_indices: Optional[Dict[str, List[int]]] = None):
+        super(IRTECONFilesLoader, self).__init__()
+
+        self.file_names: List[str] = file_names
+        self.cache: Optional[IRTECONCache] = cache
+        # the curves to keep of the files listed, by their indices
+        self.curve_indices: Dict[str, List[int]] = curve_indices or dict()
+        self.signals: IRTECONFilesLoader.Signals = self.Signals()
+        self._cancelled: bool = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        # the thread only waits for the worker processes that do the parsing
+        files_done: int = 0
+        for file_name, file_data in iter_irtecon_files(self.file_names, is_cancelled=lambda: self._cancelled,
+                                                        cache=self.cache):
+            if isinstance(file_data, Exception):
+                self.signals.file_failed.emit(file_name, getattr(file_data, 'strerror', None) or str(file_data))
+            else:
+                if file_name in self.curve_indices:
+                    file_data.curves = [file_data.curves[index] for index in self.curve_indices[file_name]
+                                        if index < len(file_data.curves)]
+                self.signals.file_loaded.emit(file_name, file_data)
+            files_done += 1
+            self.signals.progress.emit(files_done)
+        if not self._cancelled:
+            self.signals.finished.emit()
+
+
+class ArchiveIndexer(QRunnable):
+    class Signals(QObject):
+        progress: pyqtSignal = pyqtSignal(int, int)
+        finished: pyqtSignal = pyqtSignal(int, int)
+        failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, directory: str, index_file_name: str = ''):
+        super(ArchiveIndexer, self).__init__()
+
+        self.directory: str = directory
+        self.index_file_name: str = index_file_name
+        self.signals: ArchiveIndexer.Signals = self.Signals()
+        self._cancelled: bool = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        # the index is opened here: an SQLite connection can't be used in another thread
+        try:
+            index: ArchiveIndex = ArchiveIndex(self.index_file_name)
+            try:
+                files_indexed, files_removed = index.update(self.directory, is_cancelled=lambda: self._cancelled,
+                                                            progress=self.signals.progress.emit)
+            finally:
+                index.close()
+        except Exception as ex:
+            # nothing is to escape the thread
+            self.signals.failed.emit(getattr(ex, 'strerror', None) or str(ex))
+            return
+        if not self._cancelled:
+            self.signals.finished.emit(files_indexed, files_removed)
+
+
+class PlainTextFileLoader(QRunnable):
+    class Signals(QObject):
+        loaded: pyqtSignal = pyqtSignal(object)
+        finished: pyqtSignal = pyqtSignal()
+        failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, file_name: str, settings: PlainTextImportSettings):
+        super(PlainTextFileLoader, self).__init__()
+
+        self.file_name: str = file_name
+        self.settings: PlainTextImportSettings = settings
+        self.signals: PlainTextFileLoader.Signals = self.Signals()
+        self._cancelled: bool = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        try:
+            with profiler.stage('parse plain text file', os.path.getsize(self.file_name)):
+                text_file: PlainTextFile = PlainTextFile(self.file_name, self.settings)
+        except Exception as ex:
+            # nothing is to escape the thread, whatever the settings are
+            self.signals.failed.emit(getattr(ex, 'strerror', None) or str(ex))
+            return
+        if not self._cancelled:
+            self.signals.loaded.emit(text_file)
+            self.signals.finished.emit()
+
+
+class PlainTextPreviewLoader(QRunnable):
+    class Signals(QObject):
+        loaded: pyqtSignal = pyqtSignal(object)
+        failed: pyqtSignal = pyqtSignal(str)
+
+    def __init__(self, line_index: LineIndex, settings: PlainTextImportSettings, rows: int, from_end: bool = False):
+        super(PlainTextPreviewLoader, self).__init__()
+
+        self.line_index: LineIndex = line_index
+        self.settings: PlainTextImportSettings = settings
+        self.rows: int = rows
+        self.from_end: bool = from_end
+        self.signals: PlainTextPreviewLoader.Signals = self.Signals()
+
+    def run(self):
+        # only the lines needed for the preview are read; the index is built if the end of the file is needed
+        text_file: PlainTextFile = PlainTextFile(settings=self.settings)
+        try:
+            text_file.read_indexed(self.line_index, max_rows=self.rows, from_end=self.from_end)
+        except Exception as ex:
+            # any settings may be tried in the preview, and nothing is to escape the thread
+            self.signals.failed.emit(getattr(ex, 'strerror', None) or str(ex))
+            return
+        self.signals.loaded.emit(text_file)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from typing import Optional
+
+from PyQt5.QtCore import QCoreApplication, QDateTime, Qt
+from PyQt5.QtWidgets import QCheckBox, QDateTimeEdit, QDialog, QDialogButtonBox, QFormLayout, QLineEdit
+
+
+class FindCurvesDialog(QDialog):
+    # the query for the curves of the open plots
+    def __init__(self, parent=None):
+        super(FindCurvesDialog, self).__init__(parent)
+
+        self._translate = QCoreApplication.translate
+
+        self.main_layout = QFormLayout(self)
+
+        self.text_legend = QLineEdit(self)
+        self.text_legend.setPlaceholderText(self._translate('FindCurvesDialog', 'e.g., run 1*'))
+        self.main_layout.addRow(self._translate('FindCurvesDialog', 'Legend:'), self.text_legend)
+        self.check_from = QCheckBox(self._translate('FindCurvesDialog', 'Recorded from:'), self)
+        self.datetime_from = QDateTimeEdit(self)
+        self.main_layout.addRow(self.check_from, self.datetime_from)
+        self.check_to = QCheckBox(self._translate('FindCurvesDialog', 'Recorded until:'), self)
+        self.datetime_to = QDateTimeEdit(self)
+        self.main_layout.addRow(self.check_to, self.datetime_to)
+        for check, datetime_edit in ((self.check_from, self.datetime_from), (self.check_to, self.datetime_to)):
+            datetime_edit.setCalendarPopup(True)
+            datetime_edit.setDisplayFormat('yyyy-MM-dd HH:mm:ss')
+            datetime_edit.setDateTime(QDateTime.currentDateTime())
+            datetime_edit.setEnabled(False)
+            check.toggled.connect(datetime_edit.setEnabled)
+
+        self.buttonBox = QDialogButtonBox(self)
+        self.buttonBox.setOrientation(Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QDialogButtonBox.Cancel | QDialogButtonBox.Ok)
+        self.main_layout.addRow(self.buttonBox)
+
+        self.setWindowTitle(self._translate('FindCurvesDialog', 'Find Curves'))
+
+        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.rejected.connect(self.reject)
+
+    @property
+    def legend_pattern(self) -> str:
+        return self.text_legend.text()
+
+    @property
+    def start(self) -> Optional[datetime]:
+        return self.datetime_from.dateTime().toPyDateTime() if self.check_from.isChecked() else None
+
+    @property
+    def stop(self) -> Optional[datetime]:
+        return self.datetime_to.dateTime().toPyDateTime() if self.check_to.isChecked() else None
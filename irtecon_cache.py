@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from irtecon_file import IRTECONFile, header_from_json, header_to_json
+
+
+# the line indexes of the plain text files share the directory, the size limit, and the eviction of the cache
+LINE_INDEX_SUFFIX: str = '.lines.npy'
+
+
+def default_cache_directory() -> str:
+    if os.name == 'nt':
+        cache_root: str = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        cache_root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_root, 'SavSoft', 'Combiner')
+
+
+class IRTECONCache:
+    # every cached file is a .npy file with the curve data concatenated and a small .json header;
+    # the header is touched on every hit, so its modification time tells which entry has been used least recently
+    FORMAT_VERSION: int = 1
+    DEFAULT_SIZE_LIMIT: int = 1 << 30
+
+    def __init__(self, directory: str = '', size_limit: int = DEFAULT_SIZE_LIMIT):
+        self.directory: str = directory or default_cache_directory()
+        self.size_limit: int = size_limit
+
+    @staticmethod
+    def _source_key(file_name: str) -> Tuple[str, int, int]:
+        path: str = os.path.realpath(file_name)
+        stat: os.stat_result = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _entry_paths(self, path: str) -> Tuple[str, str]:
+        name: str = hashlib.sha1(path.encode()).hexdigest()
+        return os.path.join(self.directory, name + '.json'), os.path.join(self.directory, name + '.npy')
+
+    def _entries(self) -> List[Tuple[float, int, Tuple[str, ...]]]:
+        # the time of the last use, the size, and the files of every entry
+        entries: List[Tuple[float, int, Tuple[str, ...]]] = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith('.json'):
+                    data_path: str = entry.path[:-len('.json')] + '.npy'
+                    try:
+                        size: int = entry.stat().st_size + os.path.getsize(data_path)
+                    except OSError:
+                        size = entry.stat().st_size
+                    entries.append((entry.stat().st_mtime, size, (entry.path, data_path)))
+                elif entry.name.endswith(LINE_INDEX_SUFFIX):
+                    entries.append((entry.stat().st_mtime, entry.stat().st_size, (entry.path,)))
+            except OSError:
+                # removed meanwhile
+                continue
+        return entries
+
+    @property
+    def size(self) -> int:
+        return sum(entry[1] for entry in self._entries())
+
+    def load(self, file_name: str) -> Optional[IRTECONFile]:
+        try:
+            path, mtime, size = self._source_key(file_name)
+        except OSError:
+            return None
+        header_path, data_path = self._entry_paths(path)
+        try:
+            with open(header_path, 'rt', encoding='utf-8') as header_file:
+                header: Dict[str, Any] = json.load(header_file)
+            if (header.get('version') != self.FORMAT_VERSION
+                    or header.get('path') != path or header.get('mtime') != mtime or header.get('size') != size):
+                return None
+            data: np.ndarray = np.load(data_path, mmap_mode='r') if header['curves'] else np.empty(0)
+            file_data: IRTECONFile = header_from_json(header, data)
+            os.utime(header_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return file_data
+
+    def store(self, file_name: str, file_data: IRTECONFile):
+        try:
+            path, mtime, size = self._source_key(file_name)
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            return
+        header_path, data_path = self._entry_paths(path)
+        header: Dict[str, Any] = {
+            'version': self.FORMAT_VERSION,
+            'path': path,
+            'mtime': mtime,
+            'size': size,
+            **header_to_json(file_data),
+        }
+        # the temporary files are unique, for two loaders may store the same file at once
+        temporary_paths: List[str] = []
+        try:
+            # write the data first: the header marks a complete entry
+            if file_data.curves:
+                data_file_descriptor, temporary_data_path = tempfile.mkstemp(suffix='.npy.tmp', dir=self.directory)
+                temporary_paths.append(temporary_data_path)
+                with os.fdopen(data_file_descriptor, 'wb') as data_file:
+                    # write the curves one by one, not a copy of them all
+                    np.lib.format.write_array_header_1_0(data_file, {
+                        'descr': np.lib.format.dtype_to_descr(np.dtype(float)),
+                        'fortran_order': False,
+                        'shape': (sum(curve.data.size for curve in file_data.curves),),
+                    })
+                    for curve in file_data.curves:
+                        data_file.write(np.ascontiguousarray(curve.data, dtype=float).data)
+                os.replace(temporary_data_path, data_path)
+            header_file_descriptor, temporary_header_path = tempfile.mkstemp(suffix='.json.tmp', dir=self.directory)
+            temporary_paths.append(temporary_header_path)
+            with os.fdopen(header_file_descriptor, 'wt', encoding='utf-8') as header_file:
+                json.dump(header, header_file, ensure_ascii=False)
+            os.replace(temporary_header_path, header_path)
+        except (OSError, ValueError):
+            for temporary_path in temporary_paths:
+                try:
+                    os.remove(temporary_path)
+                except OSError:
+                    pass
+            return
+        self.evict()
+
+    def evict(self):
+        entries: List[Tuple[float, int, Tuple[str, ...]]] = sorted(self._entries())
+        total_size: int = sum(entry[1] for entry in entries)
+        for _, size, paths in entries:
+            if total_size <= self.size_limit:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_size -= size
@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
+import locale
+import mmap
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
 
 import numpy as np
 
+from load_profiler import profiler
+
+WRITE_BLOCK_ROWS: int = 1 << 14
+MONTHS: Tuple[str, ...] = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+# written for an empty unit of an axis with a name of several words, which would be taken for the unit otherwise
+NO_UNIT: str = '-'
+_MONTH_NUMBERS: Dict[str, int] = {month: number for number, month in enumerate(MONTHS, start=1)}
+# the positions of the digits and of the month in the usual `HH:MM:SS DD-Mon-YYYY`
+_DATE_DIGITS: Tuple[int, ...] = (0, 1, 3, 4, 6, 7, 9, 10, 16, 17, 18, 19)
+_DATE_SEPARATORS: Dict[int, str] = {2: ':', 5: ':', 8: ' ', 11: '-', 15: '-'}
+_MONTH_CODES: np.ndarray = np.array([(ord(month[0]) << 16) | (ord(month[1]) << 8) | ord(month[2]) for month in MONTHS])
+
 
 class IRTECONAxis:
+    # a file may have thousands of the objects below, so they have no `__dict__`
+    __slots__ = ('name', 'unit', 'min', 'max', 'axis')
+
     def __init__(self, line: str = ''):
         self.name: str = ''
         self.unit: str = ''
@@ -15,31 +32,84 @@ class IRTECONAxis:
 
         if line:
             words = line.split()
+            if len(words) < 3:
+                raise ValueError(f'Invalid axis description: {line.strip()}')
             self.axis = int(words[0])
             self.min = float(words[1].replace(',', '.'))
             self.max = float(words[2].replace(',', '.'))
             if len(words) == 10:
                 self.name = words[9]
             elif len(words) > 10:
-                self.unit = words[9]
+                self.unit = '' if words[9] == NO_UNIT else words[9]
                 self.name = ' '.join(words[10:])
 
     def __repr__(self):
-        return 'IRTECONAxis(' + ', '.join(f'{key}={repr(value)}' for key, value in self.__dict__.items()) + ')'
+        return 'IRTECONAxis(' + ', '.join(f'{key}={repr(getattr(self, key))}' for key in self.__slots__) + ')'
 
 
 class IRTECONCurve:
+    __slots__ = ('time', 'duration', 'legend_key', 'span', '_data', '_mapped_data')
+
     def __init__(self):
         self.time: datetime = datetime.fromtimestamp(0)
         self.duration: float = 0.
         self.legend_key: str = ''
-        self.data: np.ndarray = np.empty(0)
+        # offsets of the data block in the source content
+        self.span: Tuple[int, int] = (0, 0)
+        self._data: np.ndarray = np.empty(0)
+        self._mapped_data: Optional[mmap.mmap] = None
+
+    @property
+    def data(self) -> np.ndarray:
+        self.load()
+        return self._data
+
+    @data.setter
+    def data(self, new_data: np.ndarray):
+        self._data = new_data
+        self._mapped_data = None
+
+    def map_data(self, buffer: mmap.mmap, start: int, end: int):
+        # postpone parsing the data until it is accessed
+        self.span = (start, end)
+        self._mapped_data = buffer
+
+    def load(self):
+        if self._mapped_data is not None:
+            with profiler.stage('parse curve data', self.span[1] - self.span[0]):
+                self._data = parse_curve_data(self._mapped_data[self.span[0]:self.span[1]].decode('ascii'))
+            self._mapped_data = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._mapped_data is None
+
+    def view(self) -> 'IRTECONCurve':
+        # a copy that shares the data but can't change them
+        curve: IRTECONCurve = IRTECONCurve()
+        curve.time = self.time
+        curve.duration = self.duration
+        curve.legend_key = self.legend_key
+        curve.span = self.span
+        curve.data = self.data.view()
+        curve.data.flags.writeable = False
+        return curve
 
     def __repr__(self):
-        return 'IRTECONCurve(' + ', '.join(f'{key}={repr(value)}' for key, value in self.__dict__.items()) + ')'
+        # don't parse the data just to show them
+        return 'IRTECONCurve(' + ', '.join([f'{key}={repr(getattr(self, key))}'
+                                            for key in ('time', 'duration', 'legend_key')]
+                                           + [f'data={repr(self._data)}' if self.is_loaded
+                                              else f'span={repr(self.span)}']) + ')'
 
 
 def parse_date(date: str) -> datetime:
+    # the usual `HH:MM:SS DD-Mon-YYYY` gets sliced, anything else gets split
+    if len(date) == 20 and date[2] == date[5] == ':' and date[8] == ' ' and date[11] == date[15] == '-':
+        month_number: Optional[int] = _MONTH_NUMBERS.get(date[12:15])
+        if month_number is not None:
+            return datetime(int(date[16:]), month_number, int(date[9:11]),
+                            int(date[:2]), int(date[3:5]), int(date[6:8]))
     hour: int
     minute: int
     second: int
@@ -50,10 +120,207 @@ def parse_date(date: str) -> datetime:
     hour, minute, second = tuple(map(int, time.split(':')))
     day_str, month_str, year_str = date.split('-')
     day, year = tuple(map(int, (day_str, year_str)))
-    month = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec').index(month_str) + 1
+    month = MONTHS.index(month_str) + 1
     return datetime(year, month, day, hour, minute, second)
 
 
+def parse_dates(dates: Sequence[str]) -> np.ndarray:
+    # the same as `parse_date` for many dates at once, as `datetime64[s]`;
+    # the usual dates are converted together, and the rest one by one
+    times: np.ndarray = np.empty(len(dates), dtype='datetime64[s]')
+    if not len(dates):
+        return times
+    text: np.ndarray = np.asarray(dates, dtype=str)
+    usual: np.ndarray = np.zeros(len(dates), dtype=bool)
+    if text.dtype.itemsize >= 20 * 4:
+        chars: np.ndarray = text.astype('U20').view(np.uint32).reshape(-1, 20).astype(np.int64)
+        usual = np.char.str_len(text) == 20
+        for position, separator in _DATE_SEPARATORS.items():
+            usual &= chars[:, position] == ord(separator)
+        digits: np.ndarray = chars[:, _DATE_DIGITS] - ord('0')
+        usual &= np.all((digits >= 0) & (digits <= 9), axis=1) & np.all(chars[:, 12:15] < 128, axis=1)
+        month_codes: np.ndarray = (chars[:, 12] << 16) | (chars[:, 13] << 8) | chars[:, 14]
+        month_order: np.ndarray = np.argsort(_MONTH_CODES)
+        month_positions: np.ndarray = np.clip(np.searchsorted(_MONTH_CODES[month_order], month_codes), 0, 11)
+        usual &= _MONTH_CODES[month_order][month_positions] == month_codes
+        months: np.ndarray = month_order[month_positions]
+        numbers: np.ndarray = digits[:, ::2] * 10 + digits[:, 1::2]
+        hours, minutes, seconds, days = numbers[:, 0], numbers[:, 1], numbers[:, 2], numbers[:, 3]
+        years: np.ndarray = numbers[:, 4] * 100 + numbers[:, 5]
+        month_starts: np.ndarray = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + months
+        month_lengths: np.ndarray = ((month_starts + 1).astype('datetime64[D]')
+                                     - month_starts.astype('datetime64[D]')).astype(np.int64)
+        # the impossible dates are left for `parse_date` to complain about
+        usual &= (hours < 24) & (minutes < 60) & (seconds < 60) & (days >= 1) & (days <= month_lengths) & (years > 0)
+        times[usual] = ((month_starts.astype('datetime64[D]') + (days - 1)).astype('datetime64[s]')
+                        + (hours * 3600 + minutes * 60 + seconds))[usual]
+    for index in np.flatnonzero(~usual):
+        times[index] = parse_date(dates[index])
+    return times
+
+
+def parse_curve_data(block: str) -> np.ndarray:
+    # convert the whole block at once instead of building an array per line
+    block = block.strip().replace(',', '.')
+    values: List[str] = block.split()
+    if not values:
+        return np.empty(0)
+    lines: List[str] = block.split('\n')
+    if len(values) % len(lines) == 0:
+        columns: int = len(values) // len(lines)
+        # a total that divides evenly may still come from rows of different widths
+        if set(map(len, map(str.split, lines))) == {columns}:
+            with profiler.stage('np.array', len(block)):
+                return np.array(values, dtype=float).reshape(len(lines), columns)
+    # ragged rows: fall back to the line-by-line conversion
+    return np.array([np.array(list(map(float, line.split()))) for line in block.splitlines()])
+
+
+class IRTECONHeader:
+    __slots__ = ('program', 'configuration_file', 'sample_name', 'span', 'axes_span')
+
+    def __init__(self):
+        self.program: str = ''
+        self.configuration_file: str = ''
+        self.sample_name: str = ''
+
+        # offsets of the header and of the axis description in the source content
+        self.span: Tuple[int, int] = (0, 0)
+        self.axes_span: Tuple[int, int] = (0, 0)
+
+    def __repr__(self):
+        return 'IRTECONHeader(' + ', '.join(f'{key}={repr(getattr(self, key))}' for key in self.__slots__) + ')'
+
+
+def iter_irtecon(content: Union[str, mmap.mmap], encoding: str = '') \
+        -> Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]:
+    # yield the header as soon as it's over, then every axis, then every curve once its `#END Curve` line is met;
+    # the header object gets updated in place should more of its lines follow
+    is_text: bool = isinstance(content, str)
+    newline: Union[str, bytes] = '\n' if is_text else b'\n'
+    data_end_marker: Union[str, bytes] = '\n#END Curve ' if is_text else b'\n#END Curve '
+    header: IRTECONHeader = IRTECONHeader()
+    header_found: bool = False
+    axis_description_found: bool = False
+    curve: Optional[IRTECONCurve] = None
+    position: int = 0
+    while position < len(content):
+        line_start: int = position
+        line_end: int = content.find(newline, position)
+        if line_end == -1:
+            line_end = len(content)
+        line: str = content[position:line_end] if is_text \
+            else content[position:line_end].decode(encoding, errors='replace')
+        line = line.rstrip('\r')
+        position = line_end + 1
+        if not header_found and line.startswith('#START '):
+            header_found = True
+            header.span = (0, line_start)
+            yield header
+        if not axis_description_found and curve is None and line.startswith(' Program     :'):
+            header.program = line[14:]
+        elif not axis_description_found and curve is None and line.startswith(' Config      :'):
+            header.configuration_file = line[14:]
+        elif not axis_description_found and curve is None and line.startswith(' Sample name :'):
+            header.sample_name = line[14:]
+        elif axis_description_found and line == '#END axis description':
+            axis_description_found = False
+            header.axes_span = (header.axes_span[0], line_start)
+        elif curve is not None and line.startswith('#END Curve ') and line.endswith('-' * 16):
+            yield curve
+            curve = None
+        elif axis_description_found and line.startswith('  '):
+            yield IRTECONAxis(line)
+        elif not axis_description_found and curve is None and line == '#START axis description':
+            axis_description_found = True
+            header.axes_span = (position, position)
+        elif not axis_description_found and curve is None and line.startswith('#START Curve description '):
+            curve = IRTECONCurve()
+        elif curve is not None and line.startswith('#START Date:'):
+            curve.time = parse_date(line[12:])
+        elif curve is not None and line.startswith('#START Time:'):
+            curve.duration = sum(float(x.replace(',', '.')) * (2 * i - 1)
+                                 for i, x in enumerate(line[12:].split(maxsplit=1)))
+        elif curve is not None and line.startswith('#START Curve Legend '):
+            curve.legend_key = line.split(':', maxsplit=1)[-1]
+        elif curve is not None and line == '#START Curve Data':
+            # the data block lasts until the `#END Curve` line; handle it in one go and jump over it
+            data_end: int = content.find(data_end_marker, position - 1)
+            if data_end == -1:
+                data_end = len(content)
+            if is_text:
+                curve.span = (position, data_end)
+                curve.data = parse_curve_data(content[position:data_end])
+            else:
+                curve.map_data(content, position, data_end)
+            position = data_end + 1
+    if not header_found:
+        header.span = (0, len(content))
+        yield header
+    if curve is not None:
+        yield curve
+
+
+def iter_irtecon_file(file_name: str, encoding: Optional[str] = None) \
+        -> Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]:
+    # map the file into memory and only index it: the curve data get parsed when accessed
+    with open(file_name, 'rb') as file:
+        if not file.seek(0, 2):
+            yield IRTECONHeader()
+            return
+        with profiler.stage('map file', file.tell()):
+            buffer: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    yield from iter_irtecon(buffer, encoding or locale.getpreferredencoding(False))
+
+
+def _format_number(value: float, decimal_comma: bool = True) -> str:
+    return f'{value:.9g}'.replace('.', ',') if decimal_comma else f'{value:.9g}'
+
+
+def write_irtecon_header(file: TextIO, header: IRTECONHeader, axes: Iterable[IRTECONAxis],
+                         decimal_comma: bool = True):
+    file.write(f' Program     :{header.program}\n'
+               f' Config      :{header.configuration_file}\n'
+               f' Sample name :{header.sample_name}\n'
+               '#START axis description\n')
+    for axis in axes:
+        # a single word after the display settings is the name, the first of several words is the unit
+        unit_and_name: str = axis.name
+        if axis.unit or len(axis.name.split()) > 1:
+            unit_and_name = f'{axis.unit or NO_UNIT} {axis.name}'
+        # the display settings of the axis are not kept, so the defaults are written
+        file.write(f'  {axis.axis} {_format_number(axis.min, decimal_comma)} '
+                   f'{_format_number(axis.max, decimal_comma)} 1 1 1 1 1 1 {unit_and_name}\n')
+    file.write('#END axis description\n')
+
+
+def write_irtecon_curve(file: TextIO, number: int, curve: IRTECONCurve, decimal_comma: bool = True):
+    file.write(f'#START Curve description {number}\n'
+               f'#START Date:{curve.time:%H:%M:%S} '
+               f'{curve.time.day:02d}-{MONTHS[curve.time.month - 1]}-{curve.time.year}\n'
+               f'#START Time:0 {_format_number(curve.duration, decimal_comma)}\n'
+               f'#START Curve Legend {number}:{curve.legend_key}\n'
+               '#START Curve Data\n')
+    data: np.ndarray = np.atleast_2d(curve.data)
+    if data.size:
+        # format a block of rows in one go, not row by row
+        line_format: str = ' '.join(['%.9g'] * data.shape[1]) + '\n'
+        for start in range(0, data.shape[0], WRITE_BLOCK_ROWS):
+            block: np.ndarray = data[start:start + WRITE_BLOCK_ROWS]
+            lines: str = (line_format * block.shape[0]) % tuple(block.ravel().tolist())
+            file.write(lines.replace('.', ',') if decimal_comma else lines)
+    file.write(f'#END Curve {number} ' + '-' * 16 + '\n')
+
+
+def _describe_item(item: Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]) -> Tuple[str, int]:
+    # the profiler stage of parsing the item; the data of a mapped curve get parsed later, when accessed
+    if isinstance(item, IRTECONHeader):
+        return 'parse header', item.span[1] - item.span[0]
+    if isinstance(item, IRTECONAxis):
+        return 'parse axis', 0
+    return 'parse curve', item.span[1] - item.span[0]
+
+
 class IRTECONFile:
     def __init__(self, file_content: str = ''):
 
@@ -63,41 +330,94 @@ class IRTECONFile:
         self.axes: List[IRTECONAxis] = []
         self.curves: List[IRTECONCurve] = []
 
+        # offsets of the header and of the axis description in the source content
+        self.header_span: Tuple[int, int] = (0, 0)
+        self.axes_span: Tuple[int, int] = (0, 0)
+
         if file_content:
-            axis_description_found: bool = False
-            curve_found: bool = False
-            curve_data: List[np.ndarray] = []
-            curve_data_found: bool = False
-            for line in file_content.splitlines():
-                if not axis_description_found and not curve_found and line.startswith(' Program     :'):
-                    self.program = line[14:]
-                elif not axis_description_found and not curve_found and line.startswith(' Config      :'):
-                    self.configuration_file = line[14:]
-                elif not axis_description_found and not curve_found and line.startswith(' Sample name :'):
-                    self.sample_name = line[14:]
-                elif axis_description_found and line == '#END axis description':
-                    axis_description_found = False
-                elif curve_found and line.startswith('#END Curve ') and line.endswith('-' * 16):
-                    curve_found = False
-                    curve_data_found = False
-                    if curve_data:
-                        self.curves[-1].data = np.array(curve_data)
-                elif axis_description_found and line.startswith('  '):
-                    self.axes.append(IRTECONAxis(line))
-                elif curve_data_found:
-                    curve_data.append(np.array(list(map(float, line.replace(',', '.').split()))))
-                elif not axis_description_found and not curve_found and line == '#START axis description':
-                    axis_description_found = True
-                elif not axis_description_found and not curve_found and line.startswith('#START Curve description '):
-                    self.curves.append(IRTECONCurve())
-                    curve_found = True
-                    curve_data = []
-                elif curve_found and line.startswith('#START Date:'):
-                    self.curves[-1].time = parse_date(line[12:])
-                elif curve_found and line.startswith('#START Time:'):
-                    self.curves[-1].duration = sum(float(x.replace(',', '.')) * (2 * i - 1)
-                                                   for i, x in enumerate(line[12:].split(maxsplit=1)))
-                elif curve_found and line.startswith('#START Curve Legend '):
-                    self.curves[-1].legend_key = line.split(':', maxsplit=1)[-1]
-                elif curve_found and line == '#START Curve Data':
-                    curve_data_found = True
+            for _ in self.collect(iter_irtecon(file_content)):
+                pass
+
+    @classmethod
+    def from_file(cls, file_name: str, encoding: Optional[str] = None) -> 'IRTECONFile':
+        file_data: IRTECONFile = cls()
+        for _ in file_data.collect(iter_irtecon_file(file_name, encoding)):
+            pass
+        return file_data
+
+    def collect(self, items: Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]) \
+            -> Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]:
+        # store the items while passing them through
+        header: Optional[IRTECONHeader] = None
+        for item in profiler.iterate(items, _describe_item):
+            if isinstance(item, IRTECONHeader):
+                header = item
+            elif isinstance(item, IRTECONAxis):
+                self.axes.append(item)
+            elif isinstance(item, IRTECONCurve):
+                self.curves.append(item)
+            yield item
+        if header is not None:
+            self.program = header.program
+            self.configuration_file = header.configuration_file
+            self.sample_name = header.sample_name
+            self.header_span = header.span
+            self.axes_span = header.axes_span
+
+    def items(self) -> Iterator[Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]]:
+        # the inverse of `collect`
+        header: IRTECONHeader = IRTECONHeader()
+        header.program = self.program
+        header.configuration_file = self.configuration_file
+        header.sample_name = self.sample_name
+        header.span = self.header_span
+        header.axes_span = self.axes_span
+        yield header
+        yield from self.axes
+        yield from self.curves
+
+
+def header_to_json(file_data: IRTECONFile) -> Dict[str, Any]:
+    # everything but the curve data, which are to be stored concatenated as `offset` and `shape` of every curve tell
+    header: Dict[str, Any] = {
+        'program': file_data.program,
+        'configuration_file': file_data.configuration_file,
+        'sample_name': file_data.sample_name,
+        'axes': [{'name': axis.name, 'unit': axis.unit, 'min': axis.min, 'max': axis.max, 'axis': axis.axis}
+                 for axis in file_data.axes],
+        'curves': [],
+    }
+    offset: int = 0
+    for curve in file_data.curves:
+        header['curves'].append({'time': curve.time.isoformat(), 'duration': curve.duration,
+                                 'legend_key': curve.legend_key,
+                                 'offset': offset, 'shape': list(curve.data.shape)})
+        offset += curve.data.size
+    return header
+
+
+def header_from_json(header: Dict[str, Any], data: np.ndarray) -> IRTECONFile:
+    # the inverse of `header_to_json`; the curve data are views of `data`
+    # raise `KeyError`, `TypeError`, or `ValueError` for a corrupted header
+    file_data: IRTECONFile = IRTECONFile()
+    file_data.program = header['program']
+    file_data.configuration_file = header['configuration_file']
+    file_data.sample_name = header['sample_name']
+    for axis_header in header['axes']:
+        axis: IRTECONAxis = IRTECONAxis()
+        axis.name = axis_header['name']
+        axis.unit = axis_header['unit']
+        axis.min = axis_header['min']
+        axis.max = axis_header['max']
+        axis.axis = axis_header['axis']
+        file_data.axes.append(axis)
+    for curve_header in header['curves']:
+        curve: IRTECONCurve = IRTECONCurve()
+        curve.time = datetime.fromisoformat(curve_header['time'])
+        curve.duration = curve_header['duration']
+        curve.legend_key = curve_header['legend_key']
+        start: int = curve_header['offset']
+        shape: Tuple[int, ...] = tuple(curve_header['shape'])
+        curve.data = data[start:start + int(np.prod(shape))].reshape(shape)
+        file_data.curves.append(curve)
+    return file_data
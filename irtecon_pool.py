@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import os
+import weakref
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from irtecon_cache import IRTECONCache
+from irtecon_file import IRTECONFile
+
+# the parsed file with its curve data stripped, the name of the shared memory block holding the data,
+# and the offset and the shape of every curve data array in the block
+SharedIRTECONFile = Tuple[IRTECONFile, Optional[str], List[Tuple[int, Tuple[int, ...]]]]
+
+
+def parse_irtecon_file_to_shared_memory(file_name: str,
+                                        parse: Callable[[str], IRTECONFile] = IRTECONFile.from_file) \
+        -> SharedIRTECONFile:
+    # runs in a worker process: the arrays are passed back in shared memory instead of being pickled
+    file_data: IRTECONFile = parse(file_name)
+    layout: List[Tuple[int, Tuple[int, ...]]] = []
+    size: int = 0
+    for curve in file_data.curves:
+        layout.append((size, curve.data.shape))
+        size += curve.data.size * np.dtype(float).itemsize
+    if not size:
+        return file_data, None, layout
+    shared_memory: SharedMemory = SharedMemory(create=True, size=size)
+    try:
+        for curve, (offset, shape) in zip(file_data.curves, layout):
+            np.ndarray(shape, dtype=float, buffer=shared_memory.buf, offset=offset)[...] = curve.data
+            curve.data = np.empty(0)
+    except BaseException:
+        # nothing else knows the name of the block to free it
+        shared_memory.unlink()
+        raise
+    finally:
+        shared_memory.close()
+    return file_data, shared_memory.name, layout
+
+
+def _free_shared_memory(shared_memory: SharedMemory):
+    shared_memory.unlink()
+    try:
+        shared_memory.close()
+    except BufferError:
+        # the data are still in use when the interpreter exits, and the process unmaps them
+        pass
+
+
+def attach_shared_irtecon_file(shared_file_data: SharedIRTECONFile) -> IRTECONFile:
+    # the curve data are views of the block, not copies; the block is freed when the last of them is gone
+    file_data, name, layout = shared_file_data
+    if name is None:
+        return file_data
+    shared_memory: SharedMemory = SharedMemory(name=name)
+    try:
+        block: np.ndarray = np.ndarray((shared_memory.size // np.dtype(float).itemsize,), dtype=float,
+                                       buffer=shared_memory.buf)
+    except BaseException:
+        _free_shared_memory(shared_memory)
+        raise
+    # every view of the block refers to the block itself, so the block lives as long as any curve data do
+    weakref.finalize(block, _free_shared_memory, shared_memory)
+    for curve, (offset, shape) in zip(file_data.curves, layout):
+        start: int = offset // block.itemsize
+        curve.data = block[start:start + int(np.prod(shape))].reshape(shape)
+    return file_data
+
+
+def release_shared_irtecon_file(shared_file_data: SharedIRTECONFile):
+    _, name, _ = shared_file_data
+    if name is not None:
+        shared_memory: SharedMemory = SharedMemory(name=name)
+        shared_memory.close()
+        shared_memory.unlink()
+
+
+def iter_irtecon_files(file_names: Iterable[str], max_workers: Optional[int] = None,
+                       is_cancelled: Callable[[], bool] = lambda: False, cache: Optional[IRTECONCache] = None,
+                       parse: Callable[[str], IRTECONFile] = IRTECONFile.from_file, ordered: bool = False) \
+        -> Iterator[Tuple[str, Union[IRTECONFile, Exception]]]:
+    # parse the files in parallel processes, for the parser is CPU-bound;
+    # yield the files in the order they are done, or in the order given if `ordered`,
+    # with the exception instead of the data if parsing failed;
+    # `parse` must be a function the worker processes can import
+    if cache is not None:
+        # the cached files are ready at once
+        file_names_to_parse: List[str] = []
+        for file_name in file_names:
+            if is_cancelled():
+                return
+            cached_file_data: Optional[IRTECONFile] = cache.load(file_name)
+            if cached_file_data is None:
+                file_names_to_parse.append(file_name)
+            else:
+                yield file_name, cached_file_data
+        file_names = file_names_to_parse
+    file_names = iter(file_names)
+    max_workers = max_workers or os.cpu_count() or 1
+    # don't parse far ahead of the files taken, so that the memory used is bounded however many files there are
+    max_pending: int = 2 * max_workers
+    executor: Optional[ProcessPoolExecutor] = None
+    pending: Dict[Future, str] = dict()
+    # a worker died, and the pool is of no use anymore
+    broken: Optional[BrokenProcessPool] = None
+    try:
+        while True:
+            for file_name in islice(file_names, 0 if broken is not None else max_pending - len(pending)):
+                if executor is None:
+                    # spawn the workers: forking a process that runs threads is not safe
+                    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn'))
+                try:
+                    pending[executor.submit(parse_irtecon_file_to_shared_memory, file_name, parse)] = file_name
+                except BrokenProcessPool as ex:
+                    broken = ex
+                    yield file_name, ex
+                    break
+            if not pending:
+                break
+            done: Iterable[Future]
+            if ordered:
+                done = [next(iter(pending))]
+                wait(done)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if is_cancelled():
+                    return
+                file_name = pending.pop(future)
+                try:
+                    file_data: IRTECONFile = attach_shared_irtecon_file(future.result())
+                except BrokenProcessPool as ex:
+                    broken = ex
+                    yield file_name, ex
+                except Exception as ex:
+                    # whatever a malformed file makes the parser raise, the other files go on
+                    yield file_name, ex
+                else:
+                    if cache is not None:
+                        cache.store(file_name, file_data)
+                    yield file_name, file_data
+        if broken is not None:
+            # fail the files left rather than lose them
+            for file_name in file_names:
+                if is_cancelled():
+                    return
+                yield file_name, broken
+    finally:
+        if executor is not None:
+            # free the shared memory of the files parsed but not taken
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    release_shared_irtecon_file(future.result())
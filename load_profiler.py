@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+class LoadProfiler:
+    # the time, the bytes, and the memory allocated by every stage of loading the files;
+    # nothing is recorded unless enabled, so the stages can stay in the code
+    class Stage:
+        def __init__(self, name: str, nbytes: int = 0):
+            self.name: str = name
+            # the bytes of the file or of the data the stage handles
+            self.nbytes: int = nbytes
+            self.start: int = 0
+            self.duration: int = 0
+            # the net bytes allocated during the stage, if the allocations are traced
+            self.allocated: Optional[int] = None
+            self.thread_id: int = threading.get_ident()
+
+        def __repr__(self):
+            return 'LoadProfiler.Stage(' + ', '.join(f'{key}={repr(value)}'
+                                                     for key, value in self.__dict__.items()) + ')'
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.stages: List[LoadProfiler.Stage] = []
+        self._thread_names: Dict[int, str] = dict()
+        self._tracing_started: bool = False
+
+    def enable(self, trace_allocations: bool = False):
+        # tracing the allocations slows everything down, so the times get less accurate
+        self.clear()
+        self.enabled = True
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_started = True
+        elif not trace_allocations and self._tracing_started:
+            tracemalloc.stop()
+            self._tracing_started = False
+
+    def disable(self):
+        self.enabled = False
+        if self._tracing_started:
+            tracemalloc.stop()
+            self._tracing_started = False
+
+    def clear(self):
+        self.stages = []
+
+    def mark(self) -> int:
+        # pass it as `since` to consider only the stages recorded after the call
+        return len(self.stages)
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0) -> Iterator['LoadProfiler.Stage']:
+        # the stage may be renamed or given its bytes before it's over; a stage left without a name isn't recorded
+        stage: LoadProfiler.Stage = self.Stage(name, nbytes)
+        if not self.enabled:
+            yield stage
+            return
+        tracing: bool = tracemalloc.is_tracing()
+        memory_before: int = tracemalloc.get_traced_memory()[0] if tracing else 0
+        stage.start = time.perf_counter_ns()
+        try:
+            yield stage
+        finally:
+            stage.duration = time.perf_counter_ns() - stage.start
+            if tracing and tracemalloc.is_tracing():
+                stage.allocated = tracemalloc.get_traced_memory()[0] - memory_before
+            if stage.name:
+                if stage.thread_id not in self._thread_names:
+                    self._thread_names[stage.thread_id] = threading.current_thread().name
+                self.stages.append(stage)
+
+    def iterate(self, items: Iterable, describe: Callable[[Any], Tuple[str, int]]) -> Iterator:
+        # pass the items through, timing how long every one of them takes to get made;
+        # `describe` tells the name of the stage and the bytes by the item
+        if not self.enabled:
+            yield from items
+            return
+        iterator: Iterator = iter(items)
+        while True:
+            with self.stage('') as stage:
+                try:
+                    item: Any = next(iterator)
+                except StopIteration:
+                    return
+                stage.name, stage.nbytes = describe(item)
+            yield item
+
+    def summary(self, since: int = 0) -> List[Tuple[str, int, float, int, Optional[int]]]:
+        # the name, the count, the seconds, the bytes, and the allocated bytes of the stages, the longest first;
+        # the nested stages are counted in the outer ones too
+        totals: Dict[str, List] = dict()
+        for stage in self.stages[since:]:
+            total: List = totals.setdefault(stage.name, [0, 0, 0, None])
+            total[0] += 1
+            total[1] += stage.duration
+            total[2] += stage.nbytes
+            if stage.allocated is not None:
+                total[3] = (total[3] or 0) + stage.allocated
+        return sorted(((name, count, duration * 1e-9, nbytes, allocated)
+                       for name, (count, duration, nbytes, allocated) in totals.items()),
+                      key=lambda total: total[2], reverse=True)
+
+    def summary_text(self, since: int = 0, stages: int = 4) -> str:
+        parts: List[str] = []
+        for name, count, duration, nbytes, allocated in self.summary(since)[:stages]:
+            part: str = f'{name} {duration:.3f} s'
+            details: List[str] = []
+            if count > 1:
+                details.append(f'×{count}')
+            if nbytes:
+                details.append(f'{nbytes / 2**20:.1f} MB')
+            if allocated is not None:
+                details.append(f'{allocated / 2**20:+.1f} MB allocated')
+            if details:
+                part += ' (' + ', '.join(details) + ')'
+            parts.append(part)
+        return '; '.join(parts)
+
+    def write_chrome_trace(self, file: TextIO, since: int = 0):
+        # the Trace Event Format that chrome://tracing and Perfetto read
+        pid: int = os.getpid()
+        events: List[Dict[str, Any]] = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                                         'args': {'name': thread_name}}
+                                        for thread_id, thread_name in self._thread_names.items()]
+        for stage in self.stages[since:]:
+            args: Dict[str, int] = {'bytes': stage.nbytes}
+            if stage.allocated is not None:
+                args['allocated'] = stage.allocated
+            events.append({'name': stage.name, 'cat': 'load', 'ph': 'X', 'pid': pid, 'tid': stage.thread_id,
+                           'ts': stage.start / 1e3, 'dur': stage.duration / 1e3, 'args': args})
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    def save_chrome_trace(self, file_name: str, since: int = 0):
+        with open(file_name, 'wt') as file:
+            self.write_chrome_trace(file, since)
+
+
+profiler: LoadProfiler = LoadProfiler()
@@ -24,18 +24,40 @@
 #
 ############################################################################
 
-from PyQt5.QtCore import QPoint, QSettings, QSignalMapper, QSize, Qt, QFileInfo
+import os
+import sys
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from PyQt5.QtCore import QPoint, QSettings, QSignalMapper, QSize, Qt, QFileInfo, QThreadPool, QTimer
 from PyQt5.QtGui import QKeySequence
-from PyQt5.QtWidgets import QAction, QApplication, QFileDialog, QMainWindow, QMdiArea, QMessageBox, qApp, QStyle
+from PyQt5.QtWidgets import QAction, QApplication, QDialog, QFileDialog, QLabel, QMainWindow, QMdiArea, QMessageBox, \
+    QStyle, qApp
+
+from load_profiler import profiler
 
-from plain_text_import_dialog import PlainTextImportDialog
-from pyqtchild import MDIChildPlot
+# numpy, pyqtgraph, and the modules using them are imported when first needed, so that the window shows sooner
+if TYPE_CHECKING:
+    from archive_browser import ArchiveBrowser
+    from curve_catalog import CurveCatalog
+    from curve_store import CurveStore
+    from file_loader import IRTECONFilesLoader
+    from irtecon_cache import IRTECONCache
+    from irtecon_file import IRTECONCurve, IRTECONFile
+    from plain_text_file import PlainTextImportSettings
+    from pyqtchild import MDIChildPlot
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, settings: Optional[QSettings] = None):
         super(MainWindow, self).__init__()
 
+        self._files_loaders: List['IRTECONFilesLoader'] = []
+        self._curve_store: Optional['CurveStore'] = None
+        self._archive_browser: Optional['ArchiveBrowser'] = None
+        self._curve_catalog: Optional['CurveCatalog'] = None
+        # the curves of every plot as they have been put into the catalog, by the name of the plot there
+        self._catalog_curves: Dict[str, List['IRTECONCurve']] = dict()
+
         self.mdiArea = QMdiArea()
         self.mdiArea.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.mdiArea.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
@@ -60,6 +82,17 @@ class MainWindow(QMainWindow):
         self.openAct.setStatusTip('Open an existing file')
         self.openAct.triggered.connect(self.open)
 
+        self.browseArchiveAct = QAction(self)
+        self.browseArchiveAct.setIconText('Browse Archive...')
+        self.browseArchiveAct.setStatusTip('Find the curves in a directory of IRTECON files and open them')
+        self.browseArchiveAct.triggered.connect(self.browse_archive)
+
+        self.cancelLoadAct = QAction(self)
+        self.cancelLoadAct.setIcon(self.style().standardIcon(QStyle.SP_BrowserStop))
+        self.cancelLoadAct.setIconText('Cancel Loading')
+        self.cancelLoadAct.setStatusTip('Stop loading the files into the active and the new windows')
+        self.cancelLoadAct.triggered.connect(self.cancel_loading)
+
         self.saveAct = QAction(self)
         self.saveAct.setIcon(self.style().standardIcon(QStyle.SP_DialogSaveButton))
         self.saveAct.setIconText('Save')
@@ -100,6 +133,13 @@ class MainWindow(QMainWindow):
         self.pasteAct.setStatusTip("Paste the clipboard's contents into the current selection")
         self.pasteAct.triggered.connect(self.paste)
 
+        self.findCurvesAct = QAction(self)
+        self.findCurvesAct.setIconText('Find Curves...')
+        self.findCurvesAct.setShortcut(QKeySequence.Find)
+        self.findCurvesAct.setStatusTip('Put the curves of the open plots recorded in a time range '
+                                        'or with the legend matching a pattern into a new plot')
+        self.findCurvesAct.triggered.connect(self.find_curves)
+
         self.closeAct = QAction(self)
         self.closeAct.setIconText('Close')
         self.closeAct.setShortcut('Ctrl+W')
@@ -146,9 +186,29 @@ class MainWindow(QMainWindow):
         self.aboutQtAct.setStatusTip("Show the Qt library's About box")
         self.aboutQtAct.triggered.connect(qApp.aboutQt)
 
+        self.profileLoadingAct = QAction(self)
+        self.profileLoadingAct.setIconText('Profile Loading')
+        self.profileLoadingAct.setCheckable(True)
+        self.profileLoadingAct.setStatusTip('Time the stages of loading the files and show the longest ones')
+        self.profileLoadingAct.toggled.connect(self.set_profiling)
+
+        self.traceAllocationsAct = QAction(self)
+        self.traceAllocationsAct.setIconText('Trace Allocations While Profiling')
+        self.traceAllocationsAct.setCheckable(True)
+        self.traceAllocationsAct.setStatusTip('Count the memory allocated by the stages of loading; '
+                                              'this slows the loading down')
+        self.traceAllocationsAct.toggled.connect(self.set_profiling)
+
+        self.exportTraceAct = QAction(self)
+        self.exportTraceAct.setIconText('Export Loading Trace...')
+        self.exportTraceAct.setStatusTip('Save the stages of loading recorded as a Chrome trace')
+        self.exportTraceAct.triggered.connect(self.export_trace)
+
         self.fileMenu = self.menuBar().addMenu('File')
         self.fileMenu.addAction(self.newAct)
         self.fileMenu.addAction(self.openAct)
+        self.fileMenu.addAction(self.browseArchiveAct)
+        self.fileMenu.addAction(self.cancelLoadAct)
         self.fileMenu.addAction(self.saveAct)
         self.fileMenu.addAction(self.saveAsAct)
         self.fileMenu.addSeparator()
@@ -160,6 +220,8 @@ class MainWindow(QMainWindow):
         self.editMenu.addAction(self.cutAct)
         self.editMenu.addAction(self.copyAct)
         self.editMenu.addAction(self.pasteAct)
+        self.editMenu.addSeparator()
+        self.editMenu.addAction(self.findCurvesAct)
 
         self.windowMenu = self.menuBar().addMenu('Window')
         self.update_window_menu()
@@ -170,10 +232,15 @@ class MainWindow(QMainWindow):
         self.helpMenu = self.menuBar().addMenu('Help')
         self.helpMenu.addAction(self.aboutAct)
         self.helpMenu.addAction(self.aboutQtAct)
+        self.helpMenu.addSeparator()
+        self.helpMenu.addAction(self.profileLoadingAct)
+        self.helpMenu.addAction(self.traceAllocationsAct)
+        self.helpMenu.addAction(self.exportTraceAct)
 
         self.file_tool_bar = self.addToolBar('File')
         self.file_tool_bar.addAction(self.newAct)
         self.file_tool_bar.addAction(self.openAct)
+        self.file_tool_bar.addAction(self.cancelLoadAct)
         self.file_tool_bar.addAction(self.saveAct)
 
         self.edit_tool_bar = self.addToolBar('Edit')
@@ -182,12 +249,21 @@ class MainWindow(QMainWindow):
         self.edit_tool_bar.addAction(self.pasteAct)
 
         self.statusBar().showMessage('Ready')
+        self.memory_label: QLabel = QLabel(self.statusBar())
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer: QTimer = QTimer(self)
+        self.memory_timer.timeout.connect(self.update_memory_label)
+        self.memory_timer.start(1000)
+        # the stages of loading recorded before are already reported
+        self._profile_mark: int = 0
 
         self.update_menus()
 
-        self.settings = QSettings('SavSoft', 'Combiner')
+        # the settings may be given not to touch the ones of the user, as the benchmark does
+        self.settings = settings if settings is not None else QSettings('SavSoft', 'Combiner')
 
         self.last_directory: str = ''
+        self._cache: Optional['IRTECONCache'] = None
         self.read_settings()
 
         self.setWindowTitle('MDI')
@@ -199,6 +275,8 @@ class MainWindow(QMainWindow):
             event.ignore()
         else:
             self.write_settings()
+            if self._archive_browser is not None:
+                self._archive_browser.cancel_indexing()
             event.accept()
 
     def new_file(self):
@@ -206,23 +284,232 @@ class MainWindow(QMainWindow):
         child.new_file()
         child.show()
 
+    @property
+    def curve_store(self) -> 'CurveStore':
+        if self._curve_store is None:
+            from curve_store import CurveStore
+
+            self._curve_store = CurveStore()
+        return self._curve_store
+
+    @property
+    def curve_catalog(self) -> 'CurveCatalog':
+        if self._curve_catalog is None:
+            from curve_catalog import CurveCatalog
+
+            self._curve_catalog = CurveCatalog()
+        return self._curve_catalog
+
+    def update_curve_catalog(self) -> Dict[str, 'MDIChildPlot']:
+        # put the curves of the plots changed since the last time into the catalog, and forget the plots closed;
+        # return the plots by their names in the catalog
+        children: Dict[str, 'MDIChildPlot'] = {str(id(window.widget())): window.widget()
+                                               for window in self.mdiArea.subWindowList()}
+        for name in list(self._catalog_curves):
+            if name not in children:
+                self.curve_catalog.remove(name)
+                del self._catalog_curves[name]
+        for name, child in children.items():
+            if self._catalog_curves.get(name) != child.curve_sources:
+                self.curve_catalog.add_curves(name, child.curve_sources)
+                self._catalog_curves[name] = child.curve_sources[:]
+        return children
+
+    def find_curves(self):
+        from find_curves_dialog import FindCurvesDialog
+        from irtecon_file import IRTECONCurve
+
+        dialog: FindCurvesDialog = FindCurvesDialog(self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        children: Dict[str, 'MDIChildPlot'] = self.update_curve_catalog()
+        found: List['CurveCatalog.Entry'] = self.curve_catalog.find(dialog.start, dialog.stop, dialog.legend_pattern)
+        if not found:
+            self.statusBar().showMessage('No curves found', 2000)
+            return
+        child = self.create_mdi_child()
+        child.new_file()
+        with child.batch_update():
+            # the new plot takes the title and the axes of the plot of the earliest curve found
+            for item in children[found[0].file_name].to_irtecon_file().items():
+                if not isinstance(item, IRTECONCurve):
+                    child.add_irtecon_item(item)
+            child.add_curves(children[entry.file_name].curve_sources[entry.index].view() for entry in found)
+        child.show()
+        self.statusBar().showMessage(f'{len(found)} curves found', 2000)
+        self.update_menus()
+
+    @property
+    def cache(self) -> 'IRTECONCache':
+        if self._cache is None:
+            from irtecon_cache import IRTECONCache
+
+            self._cache = IRTECONCache(self.settings.value('cache/directory', ''),
+                                       self.settings.value('cache/sizeLimit', IRTECONCache.DEFAULT_SIZE_LIMIT, int))
+        return self._cache
+
     def open(self):
-        filters = ['IRTECON files (*.grd)', 'Plain text files (*.csv *.tsv *.dat *.txt)']
-        file_name, _ = QFileDialog.getOpenFileName(self, filter=';;'.join(filters),
-                                                   directory=self.last_directory,
-                                                   options=QFileDialog.DontUseNativeDialog)
-        if file_name:
-            child = self.create_mdi_child()
-            if QFileInfo(file_name).suffix() == 'grd':
-                if child.load_irtecon_file(file_name):
-                    self.statusBar().showMessage('File loaded', 2000)
-                    self.last_directory = QFileInfo(file_name).dir().absolutePath()
-                    child.show()
-                else:
-                    child.close()
-            else:
-                print(PlainTextImportDialog(file_name).exec())
-                raise NotImplementedError
+        from plot_file import PLOT_FILE_SUFFIX
+
+        filters = ['IRTECON files (*.grd)', 'Plain text files (*.csv *.tsv *.dat *.txt)',
+                   f'Combined plots (*.{PLOT_FILE_SUFFIX})']
+        file_names, _ = QFileDialog.getOpenFileNames(self, filter=';;'.join(filters),
+                                                     directory=self.last_directory,
+                                                     options=QFileDialog.DontUseNativeDialog)
+        if not file_names:
+            return
+        self.last_directory = QFileInfo(file_names[0]).dir().absolutePath()
+        self.open_files(file_names)
+
+    def open_files(self, file_names: List[str]):
+        from plain_text_file import sniff_file
+        from plot_file import PLOT_FILE_SUFFIX
+
+        irtecon_file_names: List[str] = [file_name for file_name in file_names
+                                         if QFileInfo(file_name).suffix() == 'grd']
+        if len(irtecon_file_names) == 1:
+            self.open_irtecon_file(irtecon_file_names[0])
+        elif irtecon_file_names:
+            self.open_irtecon_files(irtecon_file_names)
+        for file_name in file_names:
+            if QFileInfo(file_name).suffix() == PLOT_FILE_SUFFIX:
+                self.open_plot_file(file_name)
+        plain_text_file_names: List[str] = [file_name for file_name in file_names
+                                            if QFileInfo(file_name).suffix() not in ('grd', PLOT_FILE_SUFFIX)]
+        if len(plain_text_file_names) == 1:
+            self.open_plain_text_file(plain_text_file_names[0])
+        else:
+            # don't ask about every file of many: guess the settings instead
+            for file_name in plain_text_file_names:
+                try:
+                    self.open_plain_text_file(file_name, sniff_file(file_name))
+                except OSError as ex:
+                    QMessageBox.warning(self, 'MDI',
+                                        f'Cannot read file {file_name}:\n{ex.strerror or ex}.')
+
+    def open_irtecon_file(self, file_name: str):
+        child = self.create_mdi_child()
+        # the curves are drawn while the file is being read
+        child.loading_progress.connect(
+            lambda percent: self.statusBar().showMessage(f'Loading {file_name}: {percent}%'))
+        child.loading_finished.connect(lambda ok: self.on_loading_finished(child, ok))
+        child.show()
+        child.load_irtecon_file(file_name, self.cache)
+        self.update_menus()
+
+    def open_plain_text_file(self, file_name: str, settings: Optional['PlainTextImportSettings'] = None):
+        if settings is None:
+            from plain_text_import_dialog import PlainTextImportDialog
+
+            dialog: PlainTextImportDialog = PlainTextImportDialog(file_name, self.cache)
+            if dialog.exec() != QDialog.Accepted:
+                return
+            settings = dialog.settings()
+        child = self.create_mdi_child()
+        child.loading_finished.connect(lambda ok: self.on_loading_finished(child, ok))
+        self.statusBar().showMessage(f'Loading {file_name}')
+        child.show()
+        child.load_plain_text_file(file_name, settings)
+        self.update_menus()
+
+    def open_plot_file(self, file_name: str):
+        child = self.create_mdi_child()
+        if child.load_plot_file(file_name):
+            self.statusBar().showMessage('File loaded', 2000)
+            child.show()
+        else:
+            child.close()
+        self.update_menus()
+
+    def open_irtecon_files(self, file_names: List[str], curve_indices: Optional[Dict[str, List[int]]] = None):
+        # the files are parsed in parallel; a window is shown as soon as its file is done
+        from file_loader import IRTECONFilesLoader
+
+        loader: IRTECONFilesLoader = IRTECONFilesLoader(file_names, self.cache, curve_indices)
+        loader.signals.file_loaded.connect(self.on_file_loaded)
+        loader.signals.file_failed.connect(self.on_file_failed)
+        loader.signals.progress.connect(self.on_files_loading_progress)
+        loader.signals.finished.connect(self.on_files_loading_finished)
+        self._files_loaders.append(loader)
+        self.statusBar().showMessage(f'Loading {len(file_names)} files')
+        QThreadPool.globalInstance().start(loader)
+        self.update_menus()
+
+    def browse_archive(self):
+        if self._archive_browser is None:
+            from archive_browser import ArchiveBrowser
+
+            self._archive_browser = ArchiveBrowser(self.settings.value('archive/directory', self.last_directory),
+                                                   parent=self)
+            self._archive_browser.curves_chosen.connect(self.open_archive_curves)
+            self._archive_browser.show()
+            # the index can be searched while the files changed since the last time get indexed
+            self._archive_browser.search()
+            self._archive_browser.update_index()
+        else:
+            self._archive_browser.show()
+        self._archive_browser.raise_()
+        self._archive_browser.activateWindow()
+
+    def open_archive_curves(self, curve_indices: Dict[str, List[int]]):
+        self.open_irtecon_files(list(curve_indices), curve_indices)
+
+    def _sender_files_loader(self) -> Optional['IRTECONFilesLoader']:
+        # the signals queued before the loading got cancelled still arrive
+        for loader in self._files_loaders:
+            if self.sender() is loader.signals:
+                return loader
+        return None
+
+    def on_file_loaded(self, file_name: str, file_data: 'IRTECONFile'):
+        if self._sender_files_loader() is None:
+            return
+        child = self.create_mdi_child()
+        child.add_irtecon_file(file_name, file_data)
+        child.show()
+
+    def on_file_failed(self, file_name: str, message: str):
+        if self._sender_files_loader() is None:
+            return
+        QMessageBox.warning(self, 'MDI',
+                            f'Cannot read file {file_name}:\n{message}.')
+
+    def on_files_loading_progress(self, files_done: int):
+        loader: Optional['IRTECONFilesLoader'] = self._sender_files_loader()
+        if loader is not None:
+            self.statusBar().showMessage(f'Loaded {files_done} of {len(loader.file_names)} files')
+
+    def on_files_loading_finished(self):
+        loader: Optional['IRTECONFilesLoader'] = self._sender_files_loader()
+        if loader is None:
+            return
+        self._files_loaders.remove(loader)
+        if profiler.enabled:
+            self.show_profile('Files loaded')
+        else:
+            self.statusBar().showMessage('Files loaded', 2000)
+        self.update_menus()
+
+    def on_loading_finished(self, child: 'MDIChildPlot', ok: bool):
+        if ok and profiler.enabled:
+            self.show_profile('File loaded')
+        elif ok:
+            self.statusBar().showMessage('File loaded', 2000)
+        else:
+            self.statusBar().clearMessage()
+            child.close()
+        self.update_menus()
+
+    def cancel_loading(self):
+        if self.active_mdi_child() and self.active_mdi_child().is_loading:
+            self.active_mdi_child().cancel_loading()
+            self.statusBar().showMessage('Loading cancelled', 2000)
+        while self._files_loaders:
+            loader: 'IRTECONFilesLoader' = self._files_loaders.pop()
+            loader.cancel()
+            loader.signals.disconnect()
+            self.statusBar().showMessage('Loading cancelled', 2000)
+        self.update_menus()
 
     def save(self):
         if self.active_mdi_child() and self.active_mdi_child().save():
@@ -249,11 +536,41 @@ class MainWindow(QMainWindow):
                           'The <b>MDI</b> example demonstrates how to write multiple '
                           'document interface applications using Qt.')
 
+    def set_profiling(self, *_):
+        if self.profileLoadingAct.isChecked():
+            profiler.enable(trace_allocations=self.traceAllocationsAct.isChecked())
+        else:
+            profiler.disable()
+        self._profile_mark = 0
+        self.update_menus()
+
+    def show_profile(self, message: str):
+        # the longest stages since the last report
+        summary: str = profiler.summary_text(since=self._profile_mark)
+        self._profile_mark = profiler.mark()
+        self.statusBar().showMessage(f'{message}: {summary}' if summary else message)
+
+    def export_trace(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, 'Export Loading Trace',
+                                                   os.path.join(self.last_directory, 'loading-trace.json'),
+                                                   filter='Chrome traces (*.json)')
+        if not file_name:
+            return
+        try:
+            profiler.save_chrome_trace(file_name)
+        except OSError as ex:
+            QMessageBox.warning(self, 'MDI', f'Cannot write file {file_name}:\n{ex.strerror or ex}.')
+            return
+        self.statusBar().showMessage('Trace exported', 2000)
+
     def update_menus(self):
         has_mdi_child = (self.active_mdi_child() is not None)
+        self.cancelLoadAct.setEnabled(bool(self._files_loaders)
+                                      or (has_mdi_child and self.active_mdi_child().is_loading))
         self.saveAct.setEnabled(has_mdi_child)
         self.saveAsAct.setEnabled(has_mdi_child)
         self.pasteAct.setEnabled(has_mdi_child)
+        self.findCurvesAct.setEnabled(has_mdi_child)
         self.closeAct.setEnabled(has_mdi_child)
         self.closeAllAct.setEnabled(has_mdi_child)
         self.tileAct.setEnabled(has_mdi_child)
@@ -261,6 +578,21 @@ class MainWindow(QMainWindow):
         self.nextAct.setEnabled(has_mdi_child)
         self.previousAct.setEnabled(has_mdi_child)
         self.separatorAct.setVisible(has_mdi_child)
+        self.exportTraceAct.setEnabled(bool(profiler.stages))
+
+    def update_memory_label(self):
+        # how much of the curve data is resident, and how much the plots save by sharing it
+        if self._curve_store is None:
+            return
+        self.memory_label.setText(f'Curves: {len(self.curve_store)}, {self.curve_store.nbytes / 2**20:.1f} MB')
+        file_sizes: Dict[str, int] = dict()
+        for (path, _, _, _), entry in self.curve_store.entries():
+            file_sizes[path] = file_sizes.get(path, 0) + entry.data.nbytes
+        self.memory_label.setToolTip('\n'.join(
+            [f'Mapped from files: {self.curve_store.mapped_nbytes / 2**20:.1f} MB',
+             f'Saved by sharing: {self.curve_store.shared_nbytes / 2**20:.1f} MB']
+            + [f'{QFileInfo(path).fileName() or "(no file)"}: {size / 2**20:.1f} MB'
+               for path, size in sorted(file_sizes.items())]))
 
     def update_window_menu(self):
         self.windowMenu.clear()
@@ -291,7 +623,9 @@ class MainWindow(QMainWindow):
             self.windowMapper.setMapping(action, window)
 
     def create_mdi_child(self):
-        child = MDIChildPlot()
+        from pyqtchild import MDIChildPlot
+
+        child = MDIChildPlot(curve_store=self.curve_store)
         self.mdiArea.addSubWindow(child)
         return child
 
@@ -306,6 +640,11 @@ class MainWindow(QMainWindow):
         self.settings.setValue('pos', self.pos())
         self.settings.setValue('size', self.size())
         self.settings.setValue('directory', self.last_directory)
+        if self._archive_browser is not None:
+            self.settings.setValue('archive/directory', self._archive_browser.directory)
+        if self._cache is not None:
+            self.settings.setValue('cache/directory', self._cache.directory)
+            self.settings.setValue('cache/sizeLimit', self._cache.size_limit)
 
     def active_mdi_child(self):
         active_sub_window = self.mdiArea.activeSubWindow()
@@ -324,10 +663,16 @@ class MainWindow(QMainWindow):
             self.mdiArea.setActiveSubWindow(window)
 
 
-if __name__ == '__main__':
-    import sys
-
+def main() -> int:
     app = QApplication(sys.argv)
-    mainWin = MainWindow()
-    mainWin.show()
-    sys.exit(app.exec_())
+    main_window = MainWindow()
+    main_window.show()
+    file_names: List[str] = app.arguments()[1:]
+    if file_names:
+        # the timer fires once the event loop runs, so the window gets painted before anything else is imported
+        QTimer.singleShot(0, lambda: main_window.open_files(file_names))
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,548 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import locale
+import mmap
+import os
+import tempfile
+from collections import deque
+from itertools import islice
+from typing import Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from irtecon_cache import IRTECONCache, LINE_INDEX_SUFFIX
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile
+
+
+SNIFF_SIZE: int = 1 << 16
+SNIFF_LINES: int = 256
+SNIFFED_COMMENT_MARKS: List[str] = ['#', '%', '!', '//', ';']
+
+
+def parse_range(ranges: str) -> List[int]:
+    # https://stackoverflow.com/a/4248689/8554611
+    result = set()
+    for part in ranges.split(','):
+        if not part.strip():
+            continue
+        x = part.split('-')
+        result.update(list(range(int(x[0]), int(x[-1]) + 1)))
+    return sorted(result)
+
+
+class PlainTextImportSettings:
+    def __init__(self):
+        self.separator: str = ','  # an empty string stands for a space or a tab
+        self.combine_separators: bool = False
+        self.comment_marks: List[str] = ['#']
+        self.text_start: str = '"'
+        self.text_end: str = '"'
+        self.decimal_comma: Optional[bool] = None  # `None` to guess
+        self.skip_rows_before_header: int = 0
+        self.has_header: bool = False
+        self.has_units: bool = False
+        self.skip_rows_after_header: int = 0
+        self.skip_rows_at_bottom: int = 0
+        self.skip_columns: List[int] = []  # zero-based
+        self.column_prefix: str = ''
+        self.column_suffix: str = ''
+        self.encoding: str = locale.getpreferredencoding(False)
+
+    def __repr__(self):
+        return 'PlainTextImportSettings(' + ', '.join(f'{key}={repr(value)}'
+                                                      for key, value in self.__dict__.items()) + ')'
+
+    def split_line(self, line: str) -> List[str]:
+        line = line.rstrip('\r\n')
+        if self.text_start and self.text_start in line:
+            return self._split_quoted_line(line)
+        if not self.separator:
+            # any whitespace
+            return line.split()
+        words: List[str] = line.split(self.separator)
+        if self.combine_separators:
+            words = [word for word in words if word]
+        return [word.strip() for word in words]
+
+    def _split_quoted_line(self, line: str) -> List[str]:
+        words: List[str] = []
+        word: List[str] = []
+        quoted: bool = False
+        position: int = 0
+        while position < len(line):
+            if quoted:
+                if line.startswith(self.text_end, position):
+                    quoted = False
+                    position += len(self.text_end)
+                    continue
+                word.append(line[position])
+                position += 1
+            elif line.startswith(self.text_start, position):
+                quoted = True
+                position += len(self.text_start)
+            elif (line[position] in ' \t') if not self.separator else line.startswith(self.separator, position):
+                words.append(''.join(word))
+                word = []
+                position += len(self.separator) or 1
+            else:
+                word.append(line[position])
+                position += 1
+        words.append(''.join(word))
+        if self.combine_separators or not self.separator:
+            words = [word for word in words if word]
+        return [word.strip() for word in words]
+
+    def is_comment(self, line: str) -> bool:
+        return (not line or line.isspace()
+                or line.lstrip().startswith(tuple(mark for mark in self.comment_marks if mark)))
+
+
+def _is_number(word: str, decimal_comma: bool = False) -> bool:
+    if decimal_comma:
+        word = word.replace(',', '.')
+    try:
+        float(word)
+    except ValueError:
+        return False
+    return True
+
+
+def sniff_settings(lines: Sequence[str]) -> PlainTextImportSettings:
+    # guess the settings from the first lines of a file
+    settings: PlainTextImportSettings = PlainTextImportSettings()
+    lines = [line.rstrip('\r\n') for line in lines]
+
+    def content_rows(marks: Sequence[str]) -> List[int]:
+        return [row for row, line in enumerate(lines)
+                if line.strip() and not line.lstrip().startswith(tuple(mark for mark in marks if mark))]
+
+    # a semicolon may start a comment, but it may as well separate the values, so it's considered later
+    settings.comment_marks = [mark for mark in SNIFFED_COMMENT_MARKS
+                              if mark != ';' and any(line.lstrip().startswith(mark) for line in lines)] \
+        or settings.comment_marks
+    rows: List[int] = content_rows(settings.comment_marks)
+    if not rows:
+        return settings
+    for text_mark in ('"', "'"):
+        if any(text_mark in lines[row] for row in rows):
+            settings.text_start = settings.text_end = text_mark
+            break
+
+    # the values are at the end of the sample, so the separator should split the last lines the same way,
+    # and into numbers preferably
+    last_rows: List[int] = rows[len(rows) // 2:]
+    best_score: Tuple[float, float, int] = (0., 0., 0)
+    field_count: int = 1
+    for separator in (',', ';', '\t', ' '):
+        candidate: PlainTextImportSettings = PlainTextImportSettings()
+        # a space stands for any whitespace here: the tabs among the spaces are looked for later
+        candidate.separator = '' if separator == ' ' else separator
+        candidate.combine_separators = separator == ' '
+        candidate.text_start = candidate.text_end = settings.text_start
+        split_rows: List[List[str]] = [candidate.split_line(lines[row]) for row in last_rows]
+        counts: List[int] = [len(words) for words in split_rows]
+        mode: int = max(set(counts), key=counts.count)
+        if mode < 2:
+            continue
+        decimal_comma: bool = separator != ','
+        numbers: int = sum(_is_number(word, decimal_comma) for words in split_rows for word in words)
+        score: Tuple[float, float, int] = (counts.count(mode) / len(counts), numbers / sum(counts), mode)
+        if score > best_score:
+            best_score = score
+            settings.separator = separator
+            field_count = mode
+    if field_count < 2:
+        return settings
+
+    if settings.separator == ' ':
+        stripped_lines: List[str] = [lines[row].strip() for row in last_rows]
+        if any('\t' in line for line in stripped_lines):
+            settings.separator = ''
+        settings.combine_separators = True
+    elif settings.separator == '\t':
+        settings.combine_separators = any('\t\t' in lines[row].strip('\t') for row in last_rows)
+    if settings.separator != ';' and any(line.lstrip().startswith(';') for line in lines):
+        settings.comment_marks.append(';')
+        rows = content_rows(settings.comment_marks)
+    split_rows = [settings.split_line(lines[row]) for row in rows]
+
+    # the columns of numbers in the last line of the usual width
+    decimal_comma = settings.separator != ','
+    last_words: List[str] = next((words for words in reversed(split_rows) if len(words) == field_count), [])
+    numeric_columns: List[int] = [column for column, word in enumerate(last_words)
+                                  if _is_number(word, decimal_comma)]
+    if not numeric_columns:
+        return settings
+    last_split_rows: List[List[str]] = split_rows[len(split_rows) // 2:]
+    numeric_words: List[str] = [words[column] for words in last_split_rows for column in numeric_columns
+                                if column < len(words) and _is_number(words[column], decimal_comma)]
+    if decimal_comma and any(',' in word for word in numeric_words):
+        settings.decimal_comma = True
+    elif any('.' in word for word in numeric_words):
+        settings.decimal_comma = False
+    settings.skip_columns = [column for column in range(field_count) if column not in numeric_columns]
+
+    def is_data(words: List[str]) -> bool:
+        return len(words) == field_count and all(not words[column] or _is_number(words[column], decimal_comma)
+                                                 for column in numeric_columns)
+
+    # the data are the lines at the end all alike; the lines just before them of the same width are the header
+    data_start: int = len(rows)
+    while data_start > 0 and is_data(split_rows[data_start - 1]):
+        data_start -= 1
+    if data_start == len(rows):
+        return settings
+    if data_start > 0 and len(split_rows[data_start - 1]) == field_count:
+        settings.has_header = True
+        header_row: int = rows[data_start - 1]
+        if (data_start > 1 and len(split_rows[data_start - 2]) == field_count
+                and rows[data_start - 2] == header_row - 1):
+            settings.has_units = True
+            header_row -= 1
+        settings.skip_rows_before_header = header_row
+    elif data_start > 0:
+        settings.skip_rows_before_header = rows[data_start - 1] + 1
+    return settings
+
+
+def sniff_file(file_name: str, encoding: str = '') -> PlainTextImportSettings:
+    # only the beginning of the file is read
+    with open(file_name, 'rb') as file:
+        sample: bytes = file.read(SNIFF_SIZE)
+        complete: bool = not file.read(1)
+    lines: List[str] = sample.decode(encoding or locale.getpreferredencoding(False), errors='replace').splitlines()
+    if not complete:
+        # the last line may be cut
+        lines = lines[:-1]
+    settings: PlainTextImportSettings = sniff_settings(lines[:SNIFF_LINES])
+    if encoding:
+        settings.encoding = encoding
+    return settings
+
+
+class LineIndex:
+    # the offset of every `STRIDE`-th line start, so that any line is found by a seek and a few line reads;
+    # built by one scan of the file and stored in the cache for the next time;
+    # the encoding must keep the newline a single '\n' byte
+    STRIDE: int = 64
+    SCAN_SIZE: int = 1 << 24
+    FORMAT_VERSION: int = 1
+
+    def __init__(self, file_name: str, encoding: str = '', cache: Optional[IRTECONCache] = None):
+        self.file_name: str = file_name
+        self.encoding: str = encoding or locale.getpreferredencoding(False)
+        self.cache: IRTECONCache = cache if cache is not None else IRTECONCache()
+        self._offsets: Optional[np.ndarray] = None
+        self._line_count: int = 0
+
+    @property
+    def is_built(self) -> bool:
+        return self._offsets is not None
+
+    @property
+    def line_count(self) -> int:
+        if self._offsets is None:
+            self.build()
+        return self._line_count
+
+    def _source_key(self) -> Tuple[str, int, int]:
+        path: str = os.path.realpath(self.file_name)
+        stat: os.stat_result = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _stored_index_path(self, path: str) -> str:
+        return os.path.join(self.cache.directory, hashlib.sha1(path.encode()).hexdigest() + LINE_INDEX_SUFFIX)
+
+    def build(self):
+        path, mtime, size = self._source_key()
+        index_path: str = self._stored_index_path(path)
+        # the stored index starts with its format version, the file modification time and size, the line count,
+        # and the stride
+        try:
+            stored: np.ndarray = np.load(index_path)
+        except (OSError, ValueError):
+            pass
+        else:
+            if stored.ndim == 1 and stored.size >= 5 \
+                    and tuple(stored[[0, 1, 2, 4]]) == (self.FORMAT_VERSION, mtime, size, self.STRIDE):
+                self._line_count = int(stored[3])
+                self._offsets = stored[5:]
+                # the cache evicts the entries used least recently
+                try:
+                    os.utime(index_path)
+                except OSError:
+                    pass
+                return
+
+        offsets: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        newline_count: int = 0
+        last_byte: int = ord('\n')
+        if size:
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for chunk_start in range(0, size, self.SCAN_SIZE):
+                    chunk: np.ndarray = np.frombuffer(buffer, dtype=np.uint8,
+                                                      count=min(self.SCAN_SIZE, size - chunk_start),
+                                                      offset=chunk_start)
+                    newlines: np.ndarray = np.flatnonzero(chunk == ord('\n'))
+                    # the newlines that end the lines just before the indexed ones
+                    first: int = (self.STRIDE - 1 - newline_count) % self.STRIDE
+                    offsets.append(newlines[first::self.STRIDE] + (chunk_start + 1))
+                    newline_count += newlines.size
+                    last_byte = int(chunk[-1])
+                    del chunk
+        self._offsets = np.concatenate(offsets)
+        self._line_count = newline_count + (last_byte != ord('\n'))
+        if self._offsets[-1] == size and size:
+            # no line starts at the very end of the file
+            self._offsets = self._offsets[:-1]
+
+        # the temporary file is unique, for the same file may be indexed twice at once
+        temporary_index_path: str = ''
+        try:
+            os.makedirs(self.cache.directory, exist_ok=True)
+            index_file_descriptor, temporary_index_path = tempfile.mkstemp(suffix=LINE_INDEX_SUFFIX + '.tmp',
+                                                                           dir=self.cache.directory)
+            with os.fdopen(index_file_descriptor, 'wb') as index_file:
+                np.save(index_file, np.concatenate((np.array([self.FORMAT_VERSION, mtime, size,
+                                                              self._line_count, self.STRIDE], dtype=np.int64),
+                                                    self._offsets)))
+            os.replace(temporary_index_path, index_path)
+        except OSError:
+            if temporary_index_path:
+                try:
+                    os.remove(temporary_index_path)
+                except OSError:
+                    pass
+            return
+        self.cache.evict()
+
+    def lines(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        # reading from the start needs no index, so the index is built only when needed
+        if stop is not None and stop <= start:
+            return
+        if start and self._offsets is None:
+            self.build()
+        with open(self.file_name, 'rb') as file:
+            line_number: int = 0
+            if start:
+                line_number = start - start % self.STRIDE
+                if line_number // self.STRIDE >= self._offsets.size:
+                    return
+                file.seek(int(self._offsets[line_number // self.STRIDE]))
+            for line in file:
+                if stop is not None and line_number >= stop:
+                    return
+                if line_number >= start:
+                    yield line.decode(self.encoding, errors='replace').rstrip('\r\n')
+                line_number += 1
+
+
+def _drop_last(lines: Iterable[str], count: int) -> Iterator[str]:
+    if count <= 0:
+        yield from lines
+        return
+    held: Deque[str] = deque()
+    for line in lines:
+        held.append(line)
+        if len(held) > count:
+            yield held.popleft()
+
+
+class PlainTextFile:
+    # the data rows are parsed by chunks, each column of a chunk in one go when possible
+    CHUNK_LINES: int = 1 << 16
+
+    def __init__(self, file_name: str = '', settings: Optional[PlainTextImportSettings] = None,
+                 max_rows: Optional[int] = None):
+        self.names: List[str] = []
+        self.units: List[str] = []
+        self.columns: List[np.ndarray] = []
+
+        self.settings: PlainTextImportSettings = settings or PlainTextImportSettings()
+
+        if file_name:
+            with open(file_name, 'rt', encoding=self.settings.encoding, errors='replace') as file:
+                self.read(file, max_rows)
+
+    @property
+    def numeric_columns(self) -> List[int]:
+        return [index for index, column in enumerate(self.columns) if column.dtype.kind == 'f']
+
+    def to_irtecon_file(self) -> IRTECONFile:
+        # the numeric columns against the first one
+        file_data: IRTECONFile = IRTECONFile()
+        numeric_columns: List[int] = self.numeric_columns
+        if not numeric_columns:
+            return file_data
+        x_column: int = numeric_columns[0]
+        x_axis: IRTECONAxis = IRTECONAxis()
+        x_axis.axis = 2
+        x_axis.name = self.names[x_column]
+        x_axis.unit = self.units[x_column]
+        file_data.axes.append(x_axis)
+        y_axis: IRTECONAxis = IRTECONAxis()
+        y_axis.axis = 3
+        if len(numeric_columns) == 2:
+            y_axis.name = self.names[numeric_columns[1]]
+            y_axis.unit = self.units[numeric_columns[1]]
+        file_data.axes.append(y_axis)
+        for y_column in numeric_columns[1:]:
+            curve: IRTECONCurve = IRTECONCurve()
+            curve.legend_key = self.names[y_column]
+            curve.data = np.column_stack((self.columns[x_column], self.columns[y_column]))
+            file_data.curves.append(curve)
+        return file_data
+
+    def read(self, lines: Iterable[str], max_rows: Optional[int] = None):
+        lines = _drop_last(lines, self.settings.skip_rows_at_bottom)
+        header, units = self._read_header(lines)
+        self._read_data(lines, header, units, max_rows)
+
+    def read_indexed(self, line_index: LineIndex, max_rows: Optional[int] = None, from_end: bool = False):
+        # same as `read`, but the rows at the bottom are skipped, and the last rows are reached, by seeking
+        settings: PlainTextImportSettings = self.settings
+        stop: Optional[int] = None
+        if settings.skip_rows_at_bottom or from_end:
+            stop = max(line_index.line_count - settings.skip_rows_at_bottom, 0)
+        lines: Iterator[str] = line_index.lines(stop=stop)
+        header, units = self._read_header(lines)
+        if from_end and max_rows is not None:
+            data_start: int = (settings.skip_rows_before_header
+                               + settings.has_header + (settings.has_header and settings.has_units)
+                               + settings.skip_rows_after_header)
+            lines = line_index.lines(start=max(data_start, stop - max_rows), stop=stop)
+        self._read_data(lines, header, units, max_rows)
+
+    def _read_header(self, lines: Iterator[str]) -> Tuple[List[str], List[str]]:
+        settings: PlainTextImportSettings = self.settings
+        for _ in islice(lines, settings.skip_rows_before_header):
+            pass
+        header: List[str] = []
+        units: List[str] = []
+        if settings.has_header:
+            header = settings.split_line(next(lines, ''))
+            if settings.has_units:
+                units = settings.split_line(next(lines, ''))
+        for _ in islice(lines, settings.skip_rows_after_header):
+            pass
+        return header, units
+
+    def _read_data(self, lines: Iterator[str], header: List[str], units: List[str], max_rows: Optional[int]):
+        settings: PlainTextImportSettings = self.settings
+        # same as `settings.is_comment` but without a call per line
+        comment_marks: Tuple[str, ...] = tuple(mark for mark in settings.comment_marks if mark)
+        data_lines: Iterator[str] = (line for line in lines
+                                     if line and not line.isspace() and not line.lstrip().startswith(comment_marks))
+        if max_rows is not None:
+            data_lines = islice(data_lines, max_rows)
+
+        first_chunk: List[str] = list(islice(data_lines, self.CHUNK_LINES))
+        if not first_chunk:
+            return
+        column_count: int = max(len(header), len(settings.split_line(first_chunk[0])))
+        used_columns: List[int] = [column for column in range(column_count) if column not in settings.skip_columns]
+        self.names = [settings.column_prefix + (header[column] if column < len(header) else str(column + 1))
+                      + settings.column_suffix
+                      for column in used_columns]
+        self.units = [units[column] if column < len(units) else '' for column in used_columns]
+
+        # `None` for the columns not yet known to be numeric or not
+        numeric: List[Optional[bool]] = [None] * len(used_columns)
+        chunks: List[List[np.ndarray]] = [[] for _ in used_columns]
+        chunk: List[str] = first_chunk
+        while chunk:
+            for index, column_chunk in enumerate(self._parse_chunk(chunk, used_columns, numeric)):
+                if numeric[index] is False and chunks[index] and chunks[index][-1].dtype.kind == 'f':
+                    # the column has turned out to be a text one
+                    chunks[index] = [previous_chunk.astype(str) for previous_chunk in chunks[index]]
+                chunks[index].append(column_chunk)
+            chunk = list(islice(data_lines, self.CHUNK_LINES))
+        self.columns = [np.concatenate(column_chunks) if len(column_chunks) > 1 else column_chunks[0]
+                        for column_chunks in chunks]
+
+    def _loadtxt_options(self) -> Optional[dict]:
+        # the options for `np.loadtxt`, or `None` if it can't split the lines the way the settings require
+        settings: PlainTextImportSettings = self.settings
+        if settings.text_start != settings.text_end or len(settings.text_start) > 1:
+            return None
+        # `np.loadtxt` refuses a quote that is the separator or a space
+        if settings.text_start and (settings.text_start == settings.separator or settings.text_start.isspace()):
+            return None
+        options: dict = {'comments': None, 'ndmin': 2, 'quotechar': settings.text_start or None}
+        if not settings.separator and settings.combine_separators:
+            options['delimiter'] = None
+        elif len(settings.separator) == 1 and not settings.combine_separators:
+            options['delimiter'] = settings.separator
+        else:
+            return None
+        return options
+
+    def _parse_chunk(self, lines: List[str], used_columns: List[int],
+                     numeric: List[Optional[bool]]) -> List[np.ndarray]:
+        settings: PlainTextImportSettings = self.settings
+        numeric_data: np.ndarray
+        options: Optional[dict] = self._loadtxt_options()
+        if options is not None and all(is_numeric is None for is_numeric in numeric) and not settings.decimal_comma:
+            # try if all the columns are numeric
+            try:
+                numeric_data = np.loadtxt(lines, dtype=float, usecols=used_columns, **options)
+            except ValueError:
+                pass
+            else:
+                numeric[:] = [True] * len(numeric)
+                return [numeric_data[:, index] for index in range(len(used_columns))]
+        if options is not None and None not in numeric:
+            numeric_lines: List[str] = lines
+            if settings.decimal_comma and settings.separator != ',':
+                numeric_lines = [line.replace(',', '.') for line in lines]
+            numeric_columns: List[int] = [column for column, is_numeric in zip(used_columns, numeric) if is_numeric]
+            text_columns: List[int] = [column for column, is_numeric in zip(used_columns, numeric) if not is_numeric]
+            try:
+                numeric_data = np.loadtxt(numeric_lines, dtype=float, usecols=numeric_columns,
+                                                      **options) if numeric_columns else np.empty((len(lines), 0))
+                text_data: np.ndarray = np.loadtxt(lines, dtype=str, usecols=text_columns,
+                                                   **options) if text_columns else np.empty((len(lines), 0))
+            except ValueError:
+                pass
+            else:
+                columns: List[np.ndarray] = []
+                numeric_index: int = 0
+                text_index: int = 0
+                for is_numeric in numeric:
+                    if is_numeric:
+                        columns.append(numeric_data[:, numeric_index])
+                        numeric_index += 1
+                    else:
+                        columns.append(text_data[:, text_index])
+                        text_index += 1
+                return columns
+
+        # the slow way: split the lines one by one and find out which columns are numeric
+        rows: List[List[str]] = [settings.split_line(line) for line in lines]
+        columns = []
+        for index, column in enumerate(used_columns):
+            words: np.ndarray = np.array([row[column] if column < len(row) else '' for row in rows])
+            if numeric[index] is not False:
+                try:
+                    columns.append(self._to_float(words))
+                except ValueError:
+                    numeric[index] = False
+                else:
+                    numeric[index] = True
+                    continue
+            columns.append(words)
+        return columns
+
+    def _to_float(self, words: np.ndarray) -> np.ndarray:
+        settings: PlainTextImportSettings = self.settings
+        words = np.where(words == '', 'nan', words)
+        if settings.decimal_comma and settings.separator != ',':
+            return np.char.replace(words, ',', '.').astype(float)
+        try:
+            return words.astype(float)
+        except ValueError:
+            if settings.decimal_comma is not None or settings.separator == ',':
+                raise
+            values: np.ndarray = np.char.replace(words, ',', '.').astype(float)
+            settings.decimal_comma = True
+            return values
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 try:
     from typing import Final
@@ -12,69 +13,95 @@ except ImportError:
 
     Final = _Final()
 
-from PyQt5.QtCore import QAbstractTableModel, QCoreApplication, QModelIndex, QVariant, Qt
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QCoreApplication, QThreadPool, QTimer, QVariant, Qt
 from PyQt5.QtWidgets import QAbstractItemView, QApplication, QCheckBox, QComboBox, QDialog, QDialogButtonBox, \
-    QFormLayout, QFrame, QGridLayout, QLineEdit, QSpinBox, QTableView
+    QFormLayout, QFrame, QGridLayout, QHeaderView, QLabel, QLineEdit, QSpinBox, QTableView
+
+from file_loader import PlainTextPreviewLoader
+from irtecon_cache import IRTECONCache
+from plain_text_file import LineIndex, PlainTextFile, PlainTextImportSettings, parse_range, sniff_file
 
 
 class PlainTextImportDialog(QDialog):
+    PREVIEW_DELAY: Final[int] = 200  # ms
+
+    # the separators in the order of `combo_separator` items; an empty string stands for a space or a tab
+    SEPARATORS: Final[List[str]] = [',', ';', ' ', '\t', '']
+    # the values of `PlainTextImportSettings.decimal_comma` in the order of `combo_decimal_separator` items
+    DECIMAL_COMMA: Final[List[Optional[bool]]] = [None, False, True]
+
     class TableModel(QAbstractTableModel):
-        ROW_BATCH_COUNT: Final[int] = 10
+        # the cells are taken from column arrays (possibly memory-mapped) only when shown,
+        # and their text is made for a whole block of rows at once and cached
+        FORMAT_BLOCK_SIZE: Final[int] = 256
+        FORMATTED_BLOCKS_CACHED: Final[int] = 256
 
         def __init__(self, parent=None):
             super().__init__(parent)
-            self._data: List[Tuple[Union[str, int, float], ...]] = []
+            self._columns: List[np.ndarray] = []
+            self._row_count: int = 0
+            self._order: Optional[np.ndarray] = None
             self._header: Dict[int, Union[str, int, float]] = dict()
-            self._rows_loaded: int = self.ROW_BATCH_COUNT
+            self._formatted: Dict[Tuple[int, int], np.ndarray] = OrderedDict()
 
         def rowCount(self, parent=None):
-            if self._data is None:
-                return 0
-            return len(self._data)
+            return self._row_count
 
         def columnCount(self, parent=None):
-            if self._data is None:
-                return 0
-            return len(self._header)
+            return len(self._columns)
+
+        def _formatted_block(self, block: int, column: int) -> np.ndarray:
+            if (block, column) in self._formatted:
+                self._formatted.move_to_end((block, column))
+                return self._formatted[(block, column)]
+            rows: slice = slice(block * self.FORMAT_BLOCK_SIZE, min((block + 1) * self.FORMAT_BLOCK_SIZE,
+                                                                    self._row_count))
+            text: np.ndarray = np.asarray(self._columns[column][rows if self._order is None
+                                                                else self._order[rows]]).astype(str)
+            self._formatted[(block, column)] = text
+            if len(self._formatted) > self.FORMATTED_BLOCKS_CACHED:
+                self._formatted.popitem(last=False)
+            return text
 
         def data(self, index, role=Qt.DisplayRole):
             if index.isValid():
                 if role == Qt.DisplayRole:
-                    return QVariant(str(self._data[index.row()][index.column()]))
+                    return QVariant(str(self._formatted_block(index.row() // self.FORMAT_BLOCK_SIZE, index.column())
+                                        [index.row() % self.FORMAT_BLOCK_SIZE]))
             return QVariant()
 
-        def set_data(self, new_data: List[Tuple[Union[str, int, float], ...]]):
-            self._data = new_data
+        def set_data(self, new_data: Sequence[np.ndarray]):
+            self.beginResetModel()
+            self._columns = list(new_data)
+            self._row_count = min((len(column) for column in self._columns), default=0)
+            self._order = None
+            self._formatted.clear()
+            self.endResetModel()
 
         def headerData(self, col, orientation, role=None):
             if orientation == Qt.Horizontal and role == Qt.DisplayRole:
-                return self._header[col]
+                return self._header.get(col)
             return None
 
         def setHeaderData(self, section: int, orientation: Qt.Orientation, value, role: int = ...) -> bool:
-            if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self._header):
+            if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self._columns):
                 self._header[section] = value
+                self.headerDataChanged.emit(orientation, section, section)
                 return True
             return False
 
         def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder) -> None:
+            if not 0 <= column < len(self._columns):
+                return
             self.beginResetModel()
-            data_column: Final[int] = {0: 1, 1: 3, 2: 5, 3: 7}[column]
-            self._data.sort(key=lambda l: l[data_column], reverse=bool(order != Qt.AscendingOrder))
+            self._order = np.argsort(self._columns[column][:self._row_count], kind='stable')
+            if order != Qt.AscendingOrder:
+                self._order = self._order[::-1]
+            self._formatted.clear()
             self.endResetModel()
 
-        def canFetchMore(self, index=QModelIndex()):
-            return len(self._data) > self._rows_loaded
-
-        def fetchMore(self, index=QModelIndex()):
-            # https://sateeshkumarb.wordpress.com/2012/04/01/paginated-display-of-table-data-in-pyqt/
-            reminder: int = len(self._data) - self._rows_loaded
-            items_to_fetch: int = min(reminder, self.ROW_BATCH_COUNT)
-            self.beginInsertRows(QModelIndex(), self._rows_loaded, self._rows_loaded + items_to_fetch - 1)
-            self._rows_loaded += items_to_fetch
-            self.endInsertRows()
-
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, cache: Optional[IRTECONCache] = None):
         super(PlainTextImportDialog, self).__init__()
 
         self._translate = QCoreApplication.translate
@@ -89,6 +116,10 @@ class PlainTextImportDialog(QDialog):
         self.table_preview.setAlternatingRowColors(True)
         self.table_preview_model = self.TableModel()
         self.table_preview.setModel(self.table_preview_model)
+        # don't measure millions of rows
+        self.table_preview.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_preview.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_preview.setSortingEnabled(True)
 
         self.main_layout.addWidget(self.table_preview, 0, 0, 1, 1)
 
@@ -141,9 +172,14 @@ class PlainTextImportDialog(QDialog):
         self.layout_preview_rows = QFormLayout()
         self.spin_preview_rows = QSpinBox(self.frame_settings)
         self.spin_preview_rows.setMinimum(1)
+        self.spin_preview_rows.setMaximum(999999)
         self.spin_preview_rows.setProperty('value', 10)
         self.layout_preview_rows.addRow(self._translate('PlainTextImportDialog', 'Rows in the preview:'),
                                         self.spin_preview_rows)
+        self.check_preview_end = QCheckBox(self.frame_settings)
+        self.layout_preview_rows.setWidget(1, QFormLayout.SpanningRole, self.check_preview_end)
+        self.label_line_count = QLabel(self.frame_settings)
+        self.layout_preview_rows.setWidget(2, QFormLayout.SpanningRole, self.label_line_count)
 
         self.layout_settings.addLayout(self.layout_preview_rows, 1, 0, 1, 1)
         self.frame_separators = QFrame(self.frame_settings)
@@ -180,6 +216,13 @@ class PlainTextImportDialog(QDialog):
         self.combo_text_end.addItems(('"', "'", '»', '”', '’', '`'))
         self.layout_separators.addRow(self._translate('PlainTextImportDialog', 'Text end:'), self.combo_text_end)
 
+        self.combo_decimal_separator = QComboBox(self.frame_separators)
+        self.combo_decimal_separator.addItem(self._translate('PlainTextImportDialog', 'guess'))
+        self.combo_decimal_separator.addItem(self._translate('PlainTextImportDialog', 'point (.)'))
+        self.combo_decimal_separator.addItem(self._translate('PlainTextImportDialog', 'comma (,)'))
+        self.layout_separators.addRow(self._translate('PlainTextImportDialog', 'Decimal separator:'),
+                                      self.combo_decimal_separator)
+
         self.layout_settings.addWidget(self.frame_separators, 1, 1, 2, 1)
         self.main_layout.addWidget(self.frame_settings, 2, 0, 1, 1)
         self.buttonBox = QDialogButtonBox(self)
@@ -193,6 +236,7 @@ class PlainTextImportDialog(QDialog):
         self.check_has_units.setText(self._translate('PlainTextImportDialog',
                                                      'The units are placed just after the header'))
         self.check_has_header.setText(self._translate('PlainTextImportDialog', 'The file has a header'))
+        self.check_preview_end.setText(self._translate('PlainTextImportDialog', 'Show the last rows'))
         self.check_combine_separators.setText(self._translate('PlainTextImportDialog', 'Combine separators'))
         self.combo_comment.setToolTip(self._translate('PlainTextImportDialog',
                                                       'This marks comment lines. Separate multiple marks with spaces.'))
@@ -205,9 +249,122 @@ class PlainTextImportDialog(QDialog):
 
         self._file_name: Path = Path(file_name)
 
-    # def try_loading(self):
-    #     if not self._file_name.exists():
-    #         self.table_preview.set
+        try:
+            self.set_settings(sniff_file(str(self._file_name)))
+        except OSError:
+            pass
+
+        # the preview is parsed in another thread a moment after the settings stop changing
+        self._line_index: LineIndex = LineIndex(str(self._file_name), cache=cache)
+        self._preview_loader: Optional[PlainTextPreviewLoader] = None
+        self._preview_pending: bool = False
+        self._preview_timer: QTimer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(self.PREVIEW_DELAY)
+        self._preview_timer.timeout.connect(self.update_preview)
+        for signal in (self.combo_separator.currentTextChanged, self.check_combine_separators.toggled,
+                       self.combo_comment.currentTextChanged,
+                       self.combo_text_start.currentTextChanged, self.combo_text_end.currentTextChanged,
+                       self.combo_decimal_separator.currentIndexChanged,
+                       self.spin_skip_rows_before_header.valueChanged,
+                       self.check_has_header.toggled, self.check_has_units.toggled,
+                       self.spin_skip_rows_after_header.valueChanged, self.spin_skip_rows_at_bottom.valueChanged,
+                       self.text_skip_columns.textChanged,
+                       self.text_column_prefix.textChanged, self.text_column_suffix.textChanged,
+                       self.spin_preview_rows.valueChanged, self.check_preview_end.toggled):
+            signal.connect(self.schedule_preview_update)
+        self.update_preview()
+
+    def settings(self) -> PlainTextImportSettings:
+        settings: PlainTextImportSettings = PlainTextImportSettings()
+        separator_index: int = self.combo_separator.currentIndex()
+        if (0 <= separator_index < len(self.SEPARATORS)
+                and self.combo_separator.currentText() == self.combo_separator.itemText(separator_index)):
+            settings.separator = self.SEPARATORS[separator_index]
+        else:
+            settings.separator = self.combo_separator.currentText()
+        settings.combine_separators = self.check_combine_separators.isChecked()
+        settings.comment_marks = self.combo_comment.currentText().split()
+        settings.text_start = self.combo_text_start.currentText()
+        settings.text_end = self.combo_text_end.currentText()
+        settings.decimal_comma = self.DECIMAL_COMMA[self.combo_decimal_separator.currentIndex()]
+        settings.skip_rows_before_header = self.spin_skip_rows_before_header.value()
+        settings.has_header = self.check_has_header.isChecked()
+        settings.has_units = self.check_has_units.isChecked()
+        settings.skip_rows_after_header = self.spin_skip_rows_after_header.value()
+        settings.skip_rows_at_bottom = self.spin_skip_rows_at_bottom.value()
+        try:
+            settings.skip_columns = [column - 1 for column in parse_range(self.text_skip_columns.text())]
+        except ValueError:
+            settings.skip_columns = []
+        settings.column_prefix = self.text_column_prefix.text()
+        settings.column_suffix = self.text_column_suffix.text()
+        return settings
+
+    def set_settings(self, settings: PlainTextImportSettings):
+        if settings.separator in self.SEPARATORS:
+            self.combo_separator.setCurrentIndex(self.SEPARATORS.index(settings.separator))
+        else:
+            self.combo_separator.setCurrentText(settings.separator)
+        self.check_combine_separators.setChecked(settings.combine_separators)
+        self.combo_comment.setCurrentText(' '.join(settings.comment_marks))
+        self.combo_text_start.setCurrentText(settings.text_start)
+        self.combo_text_end.setCurrentText(settings.text_end)
+        self.combo_decimal_separator.setCurrentIndex(self.DECIMAL_COMMA.index(settings.decimal_comma))
+        self.spin_skip_rows_before_header.setValue(settings.skip_rows_before_header)
+        self.check_has_header.setChecked(settings.has_header)
+        self.check_has_units.setChecked(settings.has_units)
+        self.spin_skip_rows_after_header.setValue(settings.skip_rows_after_header)
+        self.spin_skip_rows_at_bottom.setValue(settings.skip_rows_at_bottom)
+        self.text_skip_columns.setText(', '.join(str(column + 1) for column in settings.skip_columns))
+        self.text_column_prefix.setText(settings.column_prefix)
+        self.text_column_suffix.setText(settings.column_suffix)
+
+    def schedule_preview_update(self, *_):
+        self._preview_timer.start()
+
+    def update_preview(self):
+        if self._preview_loader is not None:
+            # parse again as soon as the current preview is done
+            self._preview_pending = True
+            return
+        self._preview_pending = False
+        self._preview_loader = PlainTextPreviewLoader(self._line_index, self.settings(),
+                                                      self.spin_preview_rows.value(),
+                                                      self.check_preview_end.isChecked())
+        self._preview_loader.signals.loaded.connect(self.on_preview_loaded)
+        self._preview_loader.signals.failed.connect(self.on_preview_failed)
+        QThreadPool.globalInstance().start(self._preview_loader)
+
+    def _on_preview_done(self):
+        self._preview_loader = None
+        if self._preview_pending:
+            self.update_preview()
+
+    def on_preview_loaded(self, text_file: PlainTextFile):
+        if self._preview_loader is None or self.sender() is not self._preview_loader.signals:
+            return
+        # the next preview must not wait forever, whatever happens here
+        try:
+            self.table_preview.setToolTip('')
+            if self._line_index.is_built:
+                self.label_line_count.setText(self._translate('PlainTextImportDialog', 'Lines in the file: {0}')
+                                              .format(self._line_index.line_count))
+            self.table_preview.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            self.table_preview_model.set_data(text_file.columns)
+            for column, name in enumerate(text_file.names):
+                self.table_preview_model.setHeaderData(column, Qt.Horizontal, name, Qt.DisplayRole)
+        finally:
+            self._on_preview_done()
+
+    def on_preview_failed(self, message: str):
+        if self._preview_loader is None or self.sender() is not self._preview_loader.signals:
+            return
+        try:
+            self.table_preview_model.set_data([])
+            self.table_preview.setToolTip(message)
+        finally:
+            self._on_preview_done()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import tempfile
+from typing import Any, BinaryIO, Dict, Tuple
+
+import numpy as np
+
+from irtecon_file import IRTECONFile, header_from_json, header_to_json
+
+# a combined plot file is the signature, the length of the JSON header, the header,
+# and the curve data concatenated as little-endian doubles, aligned so that they can be memory-mapped
+PLOT_FILE_SUFFIX: str = 'cplot'
+PLOT_FILE_SIGNATURE: bytes = b'SavSoft Combiner plot\n'
+PLOT_FILE_FORMAT_VERSION: int = 1
+_DATA_ALIGNMENT: int = 64
+_HEADER_LENGTH_SIZE: int = 8
+
+
+def write_plot(file: BinaryIO, file_data: IRTECONFile, view: Dict[str, Any]):
+    # `view` is any JSON-serializable state of the plot
+    header: Dict[str, Any] = {
+        'version': PLOT_FILE_FORMAT_VERSION,
+        **header_to_json(file_data),
+        'view': view,
+    }
+    header_bytes: bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_offset: int = len(PLOT_FILE_SIGNATURE) + _HEADER_LENGTH_SIZE + len(header_bytes)
+    data_offset += -data_offset % _DATA_ALIGNMENT
+    file.write(PLOT_FILE_SIGNATURE)
+    file.write((data_offset - len(PLOT_FILE_SIGNATURE) - _HEADER_LENGTH_SIZE).to_bytes(_HEADER_LENGTH_SIZE,
+                                                                                       'little'))
+    file.write(header_bytes.ljust(data_offset - len(PLOT_FILE_SIGNATURE) - _HEADER_LENGTH_SIZE))
+    for curve in file_data.curves:
+        file.write(np.ascontiguousarray(curve.data, dtype='<f8').data)
+
+
+def save_plot(file_name: str, file_data: IRTECONFile, view: Dict[str, Any]):
+    # write a new file and replace the old one: the old one may be mapped by an open plot;
+    # the temporary file is unique, for two plots may be saved into the same file at once
+    file_descriptor, temporary_file_name = tempfile.mkstemp(suffix='.tmp',
+                                                            dir=os.path.dirname(os.path.abspath(file_name)))
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            write_plot(file, file_data, view)
+        # the temporary file is private, unlike a file opened the usual way
+        umask: int = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary_file_name, 0o666 & ~umask)
+        os.replace(temporary_file_name, file_name)
+    except BaseException:
+        try:
+            os.remove(temporary_file_name)
+        except OSError:
+            pass
+        raise
+
+
+def plot_to_bytes(file_data: IRTECONFile, view: Dict[str, Any]) -> bytes:
+    buffer: io.BytesIO = io.BytesIO()
+    write_plot(buffer, file_data, view)
+    return buffer.getvalue()
+
+
+def _read_header(file: BinaryIO) -> Tuple[Dict[str, Any], int]:
+    # return the header and the offset of the data
+    if file.read(len(PLOT_FILE_SIGNATURE)) != PLOT_FILE_SIGNATURE:
+        raise ValueError('Not a combined plot file')
+    header_length: int = int.from_bytes(file.read(_HEADER_LENGTH_SIZE), 'little')
+    try:
+        header: Dict[str, Any] = json.loads(file.read(header_length).decode('utf-8'))
+    except UnicodeDecodeError:
+        raise ValueError('Corrupted combined plot file')
+    if not isinstance(header, dict) or header.get('version') != PLOT_FILE_FORMAT_VERSION:
+        raise ValueError('Unsupported combined plot file version')
+    return header, len(PLOT_FILE_SIGNATURE) + _HEADER_LENGTH_SIZE + header_length
+
+
+def _data_size(header: Dict[str, Any]) -> int:
+    try:
+        return sum(int(np.prod(curve_header['shape'])) for curve_header in header['curves'])
+    except (KeyError, TypeError) as ex:
+        raise ValueError(f'Corrupted combined plot file: {ex}')
+
+
+def load_plot(file_name: str) -> Tuple[IRTECONFile, Dict[str, Any]]:
+    # the curve data are memory-mapped, not read
+    with open(file_name, 'rb') as file:
+        header, data_offset = _read_header(file)
+    data_size: int = _data_size(header)
+    return _plot_from_header(header, np.memmap(file_name, dtype='<f8', mode='r', offset=data_offset,
+                                               shape=(data_size,)) if data_size else np.empty(0))
+
+
+def plot_from_bytes(payload: bytes) -> Tuple[IRTECONFile, Dict[str, Any]]:
+    # the curve data are read-only views of the payload
+    header, data_offset = _read_header(io.BytesIO(payload))
+    return _plot_from_header(header, np.frombuffer(payload, dtype='<f8', count=_data_size(header),
+                                                   offset=data_offset))
+
+
+def _plot_from_header(header: Dict[str, Any], data: np.ndarray) -> Tuple[IRTECONFile, Dict[str, Any]]:
+    try:
+        file_data: IRTECONFile = header_from_json(header, data)
+    except (KeyError, TypeError) as ex:
+        raise ValueError(f'Corrupted combined plot file: {ex}')
+    return file_data, header.get('view', dict())
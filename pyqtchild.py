@@ -22,23 +22,66 @@
 #  WARRANTY OF DESIGN, MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE.
 #
 ############################################################################
-from typing import Dict, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-from PyQt5.QtCore import QFile, QFileInfo, QTextStream, Qt
+import numpy as np
+from PyQt5.QtCore import QByteArray, QFileInfo, QMimeData, QThreadPool, Qt, pyqtSignal
 from PyQt5.QtWidgets import QAction, QApplication, QFileDialog, QInputDialog, QMenu, QMessageBox
 from pyqtgraph import PlotWidget, ViewBox, mkPen
 
-from irtecon_file import IRTECONFile
+from curve_lod import BoundsCachingViewBox, LODPlotDataItem
+from curve_merge import merge_curves
+from curve_store import CurveStore
+from file_loader import IRTECONFileLoader, PlainTextFileLoader
+from irtecon_cache import IRTECONCache
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile, IRTECONHeader
+from load_profiler import profiler
+from plain_text_file import PlainTextFile, PlainTextImportSettings, parse_range
+from plot_file import PLOT_FILE_SUFFIX, load_plot, plot_from_bytes, plot_to_bytes, save_plot
+
+
+@contextmanager
+def wait_cursor():
+    # the cursor is restored however the block ends
+    QApplication.setOverrideCursor(Qt.WaitCursor)
+    try:
+        yield
+    finally:
+        QApplication.restoreOverrideCursor()
 
 
 class MDIChildPlot(PlotWidget):
+    class CurvesMimeData(QMimeData):
+        # the plots of this process take the curves as they are, sharing the data;
+        # other processes get the curves packed in the combined plot format, and only when they ask for them
+        MIME_TYPE: str = 'application/x-savsoft-combiner-plot'
+
+        def __init__(self, file_data: IRTECONFile):
+            super().__init__()
+            self.file_data: IRTECONFile = file_data
+
+        def hasFormat(self, mime_type: str) -> bool:
+            return mime_type == self.MIME_TYPE or super().hasFormat(mime_type)
+
+        def formats(self) -> List[str]:
+            return [self.MIME_TYPE] + super().formats()
+
+        def retrieveData(self, mime_type: str, preferred_type):
+            if mime_type == self.MIME_TYPE:
+                return QByteArray(plot_to_bytes(self.file_data, dict()))
+            return super().retrieveData(mime_type, preferred_type)
+
     LINE_COLORS: List[str] = ['r', 'g', 'b', 'c', 'm', 'y', 'w']
     AXES_NAMES: Dict[int, str] = {2: 'bottom', 3: 'left', 4: 'right'}
 
     child_number: int = 1
 
-    def __init__(self, **kwargs):
-        super(MDIChildPlot, self).__init__(**kwargs)
+    loading_progress: pyqtSignal = pyqtSignal(int)
+    loading_finished: pyqtSignal = pyqtSignal(bool)
+
+    def __init__(self, curve_store: Optional[CurveStore] = None, **kwargs):
+        super(MDIChildPlot, self).__init__(viewBox=BoundsCachingViewBox(), **kwargs)
 
         self.setAttribute(Qt.WA_DeleteOnClose)
 
@@ -48,14 +91,28 @@ class MDIChildPlot(PlotWidget):
         self.cur_file: str = ''
 
         self.curves = []
-
-        self.plotItem2 = ViewBox()
+        # the values of the curves on the right axis, or None for the curves that have none
+        self.curves2: List[Optional[LODPlotDataItem]] = []
+        # the curves as they have been added, all the data columns included
+        self.curve_sources: List[IRTECONCurve] = []
+        self.header: IRTECONHeader = IRTECONHeader()
+        self.axes: Dict[int, IRTECONAxis] = dict()
+        # the curve data shared with the other plots
+        self.curve_store: Optional[CurveStore] = curve_store
+        self._loaded_curve_count: int = 0
+
+        self._loader: Optional[Union[IRTECONFileLoader, PlainTextFileLoader]] = None
+
+        self.plotItem2: ViewBox = BoundsCachingViewBox()
         self.plotItem.showAxis('right')
         self.plotItem.scene().addItem(self.plotItem2)
         self.plotItem.getAxis('right').linkToView(self.plotItem2)
         self.plotItem2.setXLink(self.plotItem)
         self.plotItem.showButtons()
         self.plotItem.showGrid(x=True, y=True)
+        self.plotItem.addLegend()
+
+        self._batch_depth: int = 0
 
         # Handle view resizing
         def update_views():
@@ -75,6 +132,7 @@ class MDIChildPlot(PlotWidget):
         self.delete_curve_menu: QMenu = QMenu('Delete')
         self.copy_curve_menu: QMenu = QMenu('Copy')
         self.paste_curve_menu: QMenu = QMenu('Paste')
+        self.combine_curve_menu: QMenu = QMenu('Combine')
         menus = {self.delete_curve_menu:
                  [('Last Curve…', self.delete_last_curve),
                   ('Curves No.…', self.delete_curves),
@@ -83,6 +141,12 @@ class MDIChildPlot(PlotWidget):
                  [('Last Curve…', self.copy_last_curve),
                   ('Curves No.…', self.copy_curves),
                   ('All Curves…', self.copy_all_curves)],
+                 self.paste_curve_menu:
+                 [('Curves', self.paste)],
+                 self.combine_curve_menu:
+                 [('Sum…', self.sum_curves),
+                  ('Average…', self.average_curves),
+                  ('Concatenation…', self.concatenate_curves)],
                  }
         for parent_menu, actions in menus.items():
             for title, callback in actions:
@@ -92,6 +156,8 @@ class MDIChildPlot(PlotWidget):
         self.plotItem.vb.menu.addMenu(self.delete_curve_menu)
         self.plotItem.vb.menu.addMenu(self.copy_curve_menu)
         self.plotItem.vb.menu.addMenu(self.paste_curve_menu)
+        self.plotItem.vb.menu.addMenu(self.combine_curve_menu)
+        self.paste_curve_menu.aboutToShow.connect(self.update_paste_menu)
 
         # hide buggy menu items
         for undesired_menu_item_index in (5, 2, 1):
@@ -107,36 +173,238 @@ class MDIChildPlot(PlotWidget):
 
         # self.sig.connect(self.document_was_modified)
 
-    def load_irtecon_file(self, file_name: str):
-        file = QFile(file_name)
-        if not file.open(QFile.ReadOnly | QFile.Text):
-            QMessageBox.warning(self, 'MDI',
-                                f'Cannot read file {file_name}:\n{file.errorString()}.')
-            return False
+    def load_irtecon_file(self, file_name: str, cache: Optional[IRTECONCache] = None):
+        # the file is read in a worker thread; the curves are shown one by one as soon as they are parsed
+        self.cancel_loading()
+        self._loader = IRTECONFileLoader(file_name, cache)
+        self._loaded_curve_count = 0
+        self._loader.signals.item_loaded.connect(self.on_item_loaded)
+        self._loader.signals.progress.connect(self.on_loading_progress)
+        self._loader.signals.finished.connect(self.on_loading_finished)
+        self._loader.signals.failed.connect(self.on_loading_failed)
+        self.set_current_file(file_name)
+        QThreadPool.globalInstance().start(self._loader)
 
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        in_str = QTextStream(file).readAll()
-        file_data = IRTECONFile(in_str)
-        self.plotItem.setTitle(file_data.sample_name)
-        self.plotItem.addLegend()
-        for index, curve in enumerate(file_data.curves):
-            self.curves.append(self.plotItem.plot(curve.data[..., :2],
-                                                  name=curve.legend_key,
-                                                  pen=mkPen(self.LINE_COLORS[index % len(self.LINE_COLORS)])))
-        for ax in self.AXES_NAMES.values():
-            self.plotItem.hideAxis(ax)
-        for ax in file_data.axes:
-            if ax.axis in self.AXES_NAMES:
-                self.plotItem.showAxis(self.AXES_NAMES[ax.axis])
-                self.plotItem.setLabel(self.AXES_NAMES[ax.axis], ax.name, ax.unit)
-        QApplication.restoreOverrideCursor()
+        # self.document().contentsChanged.connect(self.document_was_modified)
 
+        return True
+
+    def load_plain_text_file(self, file_name: str, settings: PlainTextImportSettings):
+        self.cancel_loading()
+        self._loader = PlainTextFileLoader(file_name, settings)
+        self._loader.signals.loaded.connect(self.on_plain_text_file_loaded)
+        self._loader.signals.finished.connect(self.on_loading_finished)
+        self._loader.signals.failed.connect(self.on_loading_failed)
         self.set_current_file(file_name)
+        QThreadPool.globalInstance().start(self._loader)
+        return True
 
-        # self.document().contentsChanged.connect(self.document_was_modified)
+    @property
+    def is_loading(self) -> bool:
+        return self._loader is not None
 
+    def cancel_loading(self):
+        if self._loader is None:
+            return
+        self._loader.cancel()
+        self._loader.signals.disconnect()
+        self._loader = None
+
+    def _is_current_loader_signal(self) -> bool:
+        # the signals queued before the loading got cancelled still arrive
+        return self._loader is not None and self.sender() is self._loader.signals
+
+    def add_irtecon_file(self, file_name: str, file_data: IRTECONFile):
+        # show a file parsed elsewhere
+        with self.batch_update():
+            for item in file_data.items():
+                if not isinstance(item, IRTECONCurve):
+                    self.add_irtecon_item(item)
+            for index, curve in enumerate(file_data.curves):
+                self.add_irtecon_item(curve, file_name, index)
+        self.set_current_file(file_name)
+
+    def add_plain_text_file(self, text_file: PlainTextFile):
+        # plot the numeric columns against the first one
+        file_data: IRTECONFile = text_file.to_irtecon_file()
+        if not file_data.curves:
+            return
+        with self.batch_update():
+            for ax in self.AXES_NAMES.values():
+                self.plotItem.hideAxis(ax)
+            for item in file_data.axes + file_data.curves:
+                self.add_irtecon_item(item)
+
+    @contextmanager
+    def batch_update(self):
+        # suspend the autorange, the legend layout and the repaints while many curves are added or removed,
+        # then update everything once
+        self._batch_depth += 1
+        if self._batch_depth > 1:
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+            return
+        views: List[ViewBox] = [self.plotItem.vb, self.plotItem2]
+        auto_ranges: List[List[Union[bool, float]]] = [view.autoRangeEnabled() for view in views]
+        legend_size = self.plotItem.legend.size
+        self.setUpdatesEnabled(False)
+        for view in views:
+            view.disableAutoRange()
+        # a legend of a fixed size doesn't measure itself on every entry added or removed
+        self.plotItem.legend.size = legend_size or (0, 0)
+        try:
+            yield
+        finally:
+            with profiler.stage('lay out legend'):
+                self.plotItem.legend.size = legend_size
+                self.plotItem.legend.updateSize()
+            with profiler.stage('autorange'):
+                for view, (auto_x, auto_y) in zip(views, auto_ranges):
+                    view.enableAutoRange(x=auto_x, y=auto_y)
+            self.setUpdatesEnabled(True)
+            self._batch_depth -= 1
+
+    def add_curves(self, curves: Iterable[IRTECONCurve]):
+        with self.batch_update():
+            for curve in curves:
+                self.add_irtecon_item(curve)
+
+    def remove_curves(self, indices: Iterable[int]):
+        with self.batch_update():
+            for index in sorted(set(indices), reverse=True):
+                if index in range(len(self.curves)):
+                    self.plotItem.removeItem(self.curves[index])
+                    del self.curves[index]
+                    if self.curves2[index] is not None:
+                        self.plotItem2.removeItem(self.curves2[index])
+                    del self.curves2[index]
+                    if self.curve_store is not None:
+                        self.curve_store.release(self.curve_sources[index], self)
+                    del self.curve_sources[index]
+
+    def add_irtecon_item(self, item: Union[IRTECONHeader, IRTECONAxis, IRTECONCurve],
+                         file_name: str = '', index: int = -1):
+        # `file_name` and `index` tell where a curve comes from, so that the plots showing it share its data
+        if isinstance(item, IRTECONHeader):
+            with profiler.stage('set up title'):
+                self.header = item
+                self.axes.clear()
+                self.plotItem.setTitle(item.sample_name)
+                for ax in self.AXES_NAMES.values():
+                    self.plotItem.hideAxis(ax)
+        elif isinstance(item, IRTECONAxis):
+            if item.axis in self.AXES_NAMES:
+                with profiler.stage('set up axis'):
+                    self.axes[item.axis] = item
+                    self.plotItem.showAxis(self.AXES_NAMES[item.axis])
+                    self.plotItem.setLabel(self.AXES_NAMES[item.axis], item.name, item.unit)
+        elif isinstance(item, IRTECONCurve):
+            with profiler.stage('plot curve') as stage:
+                if self.curve_store is not None:
+                    self.curve_store.share(item, self, file_name, index)
+                color: str = self.LINE_COLORS[len(self.curves) % len(self.LINE_COLORS)]
+                curve: LODPlotDataItem = LODPlotDataItem(item.data[..., :2], name=item.legend_key,
+                                                         pen=mkPen(color))
+                self.plotItem.addItem(curve)
+                self.curves.append(curve)
+                curve2: Optional[LODPlotDataItem] = None
+                if 4 in self.axes and item.data.ndim == 2 and item.data.shape[1] > 2:
+                    # the columns go in the order of the axes, so the third one is for the right axis
+                    curve2 = LODPlotDataItem(item.data[:, ::2][:, :2], pen=mkPen(color, style=Qt.DashLine))
+                    self.plotItem2.addItem(curve2)
+                    # hiding a curve with the legend hides its right axis values too
+                    curve.visibleChanged.connect(lambda: curve2.setVisible(curve.isVisible()))
+                self.curves2.append(curve2)
+                self.curve_sources.append(item)
+                stage.nbytes = item.data.nbytes
+
+    def to_irtecon_file(self) -> IRTECONFile:
+        file_data: IRTECONFile = IRTECONFile()
+        file_data.program = self.header.program
+        file_data.configuration_file = self.header.configuration_file
+        file_data.sample_name = self.header.sample_name
+        (x_min, x_max), (y_min, y_max) = self.plotItem.vb.viewRange()
+        _, (y2_min, y2_max) = self.plotItem2.viewRange()
+        ranges: Dict[int, Tuple[float, float]] = {2: (x_min, x_max), 3: (y_min, y_max), 4: (y2_min, y2_max)}
+        for axis_number, ax in self.AXES_NAMES.items():
+            axis_item = self.plotItem.getAxis(ax)
+            if axis_item.isVisible():
+                axis: IRTECONAxis = IRTECONAxis()
+                axis.axis = axis_number
+                axis.name = axis_item.labelText
+                axis.unit = axis_item.labelUnits
+                axis.min, axis.max = ranges[axis_number]
+                file_data.axes.append(axis)
+        file_data.curves = self.curve_sources[:]
+        return file_data
+
+    def view_state(self) -> Dict[str, Any]:
+        return {'range': self.plotItem.vb.viewRange(), 'auto_range': self.plotItem.vb.autoRangeEnabled(),
+                'range2': self.plotItem2.viewRange(), 'auto_range2': self.plotItem2.autoRangeEnabled()}
+
+    def set_view_state(self, state: Dict[str, Any]):
+        for view, range_key, auto_range_key in ((self.plotItem.vb, 'range', 'auto_range'),
+                                                (self.plotItem2, 'range2', 'auto_range2')):
+            if range_key in state:
+                (x_min, x_max), (y_min, y_max) = state[range_key]
+                view.setRange(xRange=(x_min, x_max), yRange=(y_min, y_max), padding=0.)
+            if auto_range_key in state:
+                auto_x, auto_y = state[auto_range_key]
+                view.enableAutoRange(x=auto_x, y=auto_y)
+
+    def load_plot_file(self, file_name: str) -> bool:
+        # the curve data get mapped into memory, so even a large plot opens at once
+        try:
+            file_data, view = load_plot(file_name)
+        except OSError as ex:
+            QMessageBox.warning(self, 'MDI', f'Cannot read file {file_name}:\n{ex.strerror or ex}.')
+            return False
+        except ValueError as ex:
+            QMessageBox.warning(self, 'MDI', f'Cannot read file {file_name}:\n{ex}.')
+            return False
+        self.add_irtecon_file(file_name, file_data)
+        self.set_view_state(view)
         return True
 
+    def on_item_loaded(self, item: Union[IRTECONHeader, IRTECONAxis, IRTECONCurve]):
+        if self._is_current_loader_signal():
+            if isinstance(item, IRTECONCurve):
+                self.add_irtecon_item(item, self._loader.file_name, self._loaded_curve_count)
+                self._loaded_curve_count += 1
+            else:
+                self.add_irtecon_item(item)
+
+    def on_plain_text_file_loaded(self, text_file: PlainTextFile):
+        if self._is_current_loader_signal():
+            self.add_plain_text_file(text_file)
+
+    def on_loading_progress(self, percent: int):
+        if self._is_current_loader_signal():
+            self.loading_progress.emit(percent)
+
+    def on_loading_finished(self):
+        if not self._is_current_loader_signal():
+            return
+        self._loader = None
+        self.loading_finished.emit(True)
+
+    def on_loading_failed(self, message: str):
+        if not self._is_current_loader_signal():
+            return
+        file_name: str = self._loader.file_name
+        self._loader = None
+        QMessageBox.warning(self, 'MDI',
+                            f'Cannot read file {file_name}:\n{message}.')
+        self.loading_finished.emit(False)
+
+    def closeEvent(self, event):
+        self.cancel_loading()
+        if self.curve_store is not None:
+            self.curve_store.release_all(self)
+        super(MDIChildPlot, self).closeEvent(event)
+
     def delete_last_curve(self):
         if not self.curves:
             return
@@ -144,31 +412,20 @@ class MDIChildPlot(PlotWidget):
                                   'Do you want to delete the last curve?',
                                   QMessageBox.Yes | QMessageBox.No)
         if ret == QMessageBox.Yes:
-            self.plotItem.legend.removeItem(self.curves[-1])
-            self.curves[-1].clear()
-            del self.curves[-1]
+            self.remove_curves([len(self.curves) - 1])
             self.is_modified = True
             self.setWindowTitle(self.user_friendly_current_file() + '[*]')
             self.setWindowModified(True)
 
     def delete_curves(self):
-        def parse_range() -> List[int]:
-            # https://stackoverflow.com/a/4248689/8554611
-            result = set()
-            for part in ranges.split(','):
-                x = part.split('-')
-                result.update(list(range(int(x[0]), int(x[-1]) + 1)))
-            return sorted(result)
         if not self.curves:
             return
         ranges, ok = QInputDialog.getText(self, 'Delete Curves', 'Curves No.:')
         if ok:
-            for index in reversed(parse_range()):
-                index -= 1
-                if index in range(len(self.curves)):
-                    self.plotItem.legend.removeItem(self.curves[index])
-                    self.curves[index].clear()
-                    del self.curves[index]
+            try:
+                self.remove_curves([index - 1 for index in parse_range(ranges)])
+            except ValueError:
+                return
             self.is_modified = True
             self.setWindowTitle(self.user_friendly_current_file() + '[*]')
             self.setWindowModified(True)
@@ -180,64 +437,157 @@ class MDIChildPlot(PlotWidget):
                                    'Do you want to delete all the curves?',
                                    QMessageBox.Yes | QMessageBox.No)
         if ret == QMessageBox.Yes:
-            while self.curves:
-                self.plotItem.legend.removeItem(self.curves[-1])
-                self.curves[-1].clear()
-                del self.curves[-1]
+            self.remove_curves(range(len(self.curves)))
             self.is_modified = True
             self.setWindowTitle(self.user_friendly_current_file() + '[*]')
             self.setWindowModified(True)
 
+    def _copy(self, indices: Iterable[int]):
+        # the curves stay in this process for the other plots to share; see `CurvesMimeData`
+        file_data: IRTECONFile = self.to_irtecon_file()
+        file_data.curves = [self.curve_sources[index].view()
+                            for index in sorted(set(indices)) if index in range(len(self.curve_sources))]
+        QApplication.clipboard().setMimeData(self.CurvesMimeData(file_data))
+
     def copy_last_curve(self):
         if not self.curves:
             return
-        raise NotImplementedError
-
-    def copy_curves(self, ranges: str):
-        def parse_range() -> List[int]:
-            # https://stackoverflow.com/a/4248689/8554611
-            result = set()
-            for part in ranges.split(','):
-                x = part.split('-')
-                result.update(list(range(int(x[0]), int(x[-1]) + 1)))
-            return sorted(result)
+        self._copy([len(self.curves) - 1])
+
+    def copy_curves(self):
         if not self.curves:
             return
-        parse_range()
-        raise NotImplementedError
+        ranges, ok = QInputDialog.getText(self, 'Copy Curves', 'Curves No.:')
+        if ok:
+            try:
+                self._copy(index - 1 for index in parse_range(ranges))
+            except ValueError:
+                pass
 
     def copy_all_curves(self):
         if not self.curves:
             return
-        raise NotImplementedError
+        self._copy(range(len(self.curves)))
+
+    def copy(self):
+        self.copy_all_curves()
+
+    def cut(self):
+        if not self.curves:
+            return
+        self.copy_all_curves()
+        self.remove_curves(range(len(self.curves)))
+        self.is_modified = True
+        self.setWindowTitle(self.user_friendly_current_file() + '[*]')
+        self.setWindowModified(True)
+
+    @staticmethod
+    def has_clipboard_curves() -> bool:
+        # the payload is decoded only when pasted, not every time the clipboard changes
+        mime_data: Optional[QMimeData] = QApplication.clipboard().mimeData()
+        return mime_data is not None and mime_data.hasFormat(MDIChildPlot.CurvesMimeData.MIME_TYPE)
+
+    @staticmethod
+    def clipboard_curves() -> Optional[IRTECONFile]:
+        mime_data: Optional[QMimeData] = QApplication.clipboard().mimeData()
+        if isinstance(mime_data, MDIChildPlot.CurvesMimeData):
+            return mime_data.file_data
+        if mime_data is not None and mime_data.hasFormat(MDIChildPlot.CurvesMimeData.MIME_TYPE):
+            # copied in another process: the curves are views of the payload
+            try:
+                file_data, _ = plot_from_bytes(bytes(mime_data.data(MDIChildPlot.CurvesMimeData.MIME_TYPE)))
+            except ValueError:
+                return None
+            return file_data
+        return None
+
+    def paste(self):
+        file_data: Optional[IRTECONFile] = self.clipboard_curves()
+        if file_data is None or not file_data.curves:
+            return
+        with self.batch_update():
+            if not self.curves:
+                # an empty plot takes the title and the axes of the curves
+                for item in file_data.items():
+                    if not isinstance(item, IRTECONCurve):
+                        self.add_irtecon_item(item)
+            self.add_curves(curve.view() for curve in file_data.curves)
+        self.is_modified = True
+        self.setWindowTitle(self.user_friendly_current_file() + '[*]')
+        self.setWindowModified(True)
+
+    def _combine(self, mode: str, title: str):
+        # add a curve made of the curves chosen, resampled to a common grid
+        if not self.curves:
+            return
+        ranges, ok = QInputDialog.getText(self, title, 'Curves No.:', text=f'1-{len(self.curves)}')
+        if not ok:
+            return
+        try:
+            sources: List[IRTECONCurve] = [self.curve_sources[index - 1] for index in parse_range(ranges)
+                                           if index - 1 in range(len(self.curve_sources))]
+        except ValueError:
+            return
+        if not sources:
+            return
+        try:
+            with wait_cursor():
+                data: np.ndarray = merge_curves([curve.data for curve in sources], mode)
+        except ValueError as ex:
+            QMessageBox.warning(self, 'MDI', f'Cannot combine the curves:\n{ex}.')
+            return
+        curve: IRTECONCurve = IRTECONCurve()
+        curve.time = min(source.time for source in sources)
+        curve.duration = sum(source.duration for source in sources)
+        curve.legend_key = f'{mode} of {ranges}'
+        curve.data = data
+        with wait_cursor(), self.batch_update():
+            self.add_irtecon_item(curve)
+        self.is_modified = True
+        self.setWindowTitle(self.user_friendly_current_file() + '[*]')
+        self.setWindowModified(True)
+
+    def sum_curves(self):
+        self._combine('sum', 'Sum of Curves')
+
+    def average_curves(self):
+        self._combine('average', 'Average of Curves')
+
+    def concatenate_curves(self):
+        self._combine('concatenate', 'Concatenation of Curves')
+
+    def update_paste_menu(self):
+        has_curves: bool = self.has_clipboard_curves()
+        for action in self.paste_curve_menu.actions():
+            action.setEnabled(has_curves)
 
     def save(self):
-        if self.is_untitled:
+        # don't overwrite the files the curves came from
+        if self.is_untitled or QFileInfo(self.cur_file).suffix() != PLOT_FILE_SUFFIX:
             return self.save_as()
         else:
             return self.save_file(self.cur_file)
 
     def save_as(self):
         file_name, _ = QFileDialog.getSaveFileName(self, 'Save As',
-                                                   self.cur_file)
+                                                   QFileInfo(self.cur_file).completeBaseName(),
+                                                   filter=f'Combined plots (*.{PLOT_FILE_SUFFIX})')
         if not file_name:
             return False
+        if QFileInfo(file_name).suffix() != PLOT_FILE_SUFFIX:
+            file_name += '.' + PLOT_FILE_SUFFIX
 
         return self.save_file(file_name)
 
     def save_file(self, file_name: str):
-        file = QFile(file_name)
-
-        if not file.open(QFile.WriteOnly | QFile.Text):
+        try:
+            with wait_cursor():
+                save_plot(file_name, self.to_irtecon_file(), self.view_state())
+        except (OSError, ValueError) as ex:
             QMessageBox.warning(self, 'MDI',
-                                f'Cannot write file {file_name}:\n{file.errorString()}.')
+                                f'Cannot write file {file_name}:\n{getattr(ex, "strerror", None) or ex}.')
             return False
 
-        out_str = QTextStream(file)
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        out_str << self.toPlainText()
-        QApplication.restoreOverrideCursor()
-
         self.set_current_file(file_name)
         return True
 
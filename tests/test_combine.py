@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import io
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+from combine import combine
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile, IRTECONHeader, write_irtecon_curve, \
+    write_irtecon_header
+
+
+def write_file(path: Path, legend_key: str):
+    header: IRTECONHeader = IRTECONHeader()
+    header.sample_name = path.stem
+    axis: IRTECONAxis = IRTECONAxis()
+    axis.name = 'Frequency'
+    axis.unit = 'MHz'
+    curve: IRTECONCurve = IRTECONCurve()
+    curve.time = datetime(2020, 3, 4, 5, 6, 7)
+    curve.legend_key = legend_key
+    curve.data = np.array([[1., 2.], [3., 4.]])
+    with open(path, 'wt') as file:
+        write_irtecon_header(file, header, [axis])
+        write_irtecon_curve(file, 1, curve)
+
+
+def test_combine_skips_bad_file(tmp_path: Path, capsys: pytest.CaptureFixture):
+    write_file(tmp_path / 'good1.grd', 'first')
+    # an axis line too short to parse
+    (tmp_path / 'bad.grd').write_text(' Program     :test\n#START axis description\n  2\n#END axis description\n')
+    write_file(tmp_path / 'good2.grd', 'second')
+    file_names: List[str] = [str(tmp_path / name) for name in ('good1.grd', 'bad.grd', 'good2.grd')]
+
+    output: io.StringIO = io.StringIO()
+    failures: int = combine(file_names, output, max_workers=2)
+
+    assert failures == 1
+    assert file_names[1] in capsys.readouterr().err
+    file_data: IRTECONFile = IRTECONFile(output.getvalue())
+    assert file_data.sample_name == 'good1'
+    assert [curve.legend_key for curve in file_data.curves] == ['first', 'second']
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from curve_merge import common_grid, merge_curves
+
+
+def test_merge_uniform_curves():
+    first: np.ndarray = np.column_stack((np.arange(5.), np.arange(5.)))
+    second: np.ndarray = np.column_stack((np.arange(2., 7.), np.ones(5)))
+    merged: np.ndarray = merge_curves([first, second], 'sum')
+    assert merged[:, 0].tolist() == [0., 1., 2., 3., 4., 5., 6.]
+    assert merged[:, 1].tolist() == [0., 1., 3., 4., 5., 1., 1.]
+
+
+def test_merge_single_points():
+    # no curve gives a step, so every x of every curve is kept
+    first: np.ndarray = np.array([[1., 10.]])
+    second: np.ndarray = np.array([[3., 30.], [3., 30.]])
+    assert common_grid([first, second]).tolist() == [1., 3.]
+    merged: np.ndarray = merge_curves([first, second], 'concatenate')
+    assert merged.tolist() == [[1., 10.], [3., 30.]]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from curve_store import CurveStore
+from irtecon_file import IRTECONCurve
+
+
+def _curve(data: np.ndarray) -> IRTECONCurve:
+    curve: IRTECONCurve = IRTECONCurve()
+    curve.data = data
+    return curve
+
+
+def test_share_same_curve(tmp_path):
+    file_name: str = str(tmp_path / 'a.grd')
+    open(file_name, 'w').close()
+    store: CurveStore = CurveStore()
+    first: IRTECONCurve = _curve(np.zeros((3, 2)))
+    second: IRTECONCurve = _curve(np.zeros((3, 2)))
+    store.share(first, 'a', file_name, 0)
+    store.share(second, 'b', file_name, 0)
+    assert second.data is first.data
+    assert len(store) == 1
+    store.release(first, 'a')
+    store.release(second, 'b')
+    assert len(store) == 0
+
+
+def test_share_changed_curve(tmp_path):
+    # the data of another shape replace the stored ones, and both are released by their owners
+    file_name: str = str(tmp_path / 'a.grd')
+    open(file_name, 'w').close()
+    store: CurveStore = CurveStore()
+    first: IRTECONCurve = _curve(np.zeros((3, 2)))
+    second: IRTECONCurve = _curve(np.zeros((4, 2)))
+    store.share(first, 'a', file_name, 0)
+    store.share(second, 'b', file_name, 0)
+    assert second.data is not first.data
+    assert len(store) == 2
+    store.release(second, 'b')
+    assert len(store) == 1
+    store.release(first, 'a')
+    assert len(store) == 0
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import io
+from datetime import datetime
+from typing import List
+
+import numpy as np
+import pytest
+
+from irtecon_file import IRTECONAxis, IRTECONCurve, IRTECONFile, IRTECONHeader, parse_curve_data, \
+    write_irtecon_curve, write_irtecon_header
+
+
+def make_axis(axis: int, name: str, unit: str) -> IRTECONAxis:
+    item: IRTECONAxis = IRTECONAxis()
+    item.axis = axis
+    item.name = name
+    item.unit = unit
+    item.min = -1.5
+    item.max = 2.5
+    return item
+
+
+@pytest.mark.parametrize(('name', 'unit'), [('Frequency', 'MHz'), ('Signal power', 'dBm'),
+                                            ('Frequency', ''), ('Signal power', ''), ('', '')])
+def test_axis_round_trip(name: str, unit: str):
+    header: IRTECONHeader = IRTECONHeader()
+    header.program = 'test'
+    header.sample_name = 'sample'
+    curve: IRTECONCurve = IRTECONCurve()
+    curve.time = datetime(2020, 3, 4, 5, 6, 7)
+    curve.duration = 1.25
+    curve.legend_key = 'run 1'
+    curve.data = np.array([[1., 2.], [3., 4.]])
+    axes: List[IRTECONAxis] = [make_axis(0, name, unit), make_axis(1, 'Time', 's')]
+
+    file: io.StringIO = io.StringIO()
+    write_irtecon_header(file, header, axes)
+    write_irtecon_curve(file, 1, curve)
+    file_data: IRTECONFile = IRTECONFile(file.getvalue())
+
+    assert [(axis.axis, axis.name, axis.unit, axis.min, axis.max) for axis in file_data.axes] \
+           == [(axis.axis, axis.name, axis.unit, axis.min, axis.max) for axis in axes]
+    assert file_data.sample_name == header.sample_name
+    assert len(file_data.curves) == 1
+    assert file_data.curves[0].time == curve.time
+    assert file_data.curves[0].legend_key == curve.legend_key
+    assert np.array_equal(file_data.curves[0].data, curve.data)
+
+
+@pytest.mark.parametrize(('block', 'expected'), [
+    ('1 2\n3 4\n', [[1., 2.], [3., 4.]]),
+    (' 1,5\t2\r\n3   4,5 ', [[1.5, 2.], [3., 4.5]]),
+    ('1 2 3', [[1., 2., 3.]]),
+    ('', []),
+])
+def test_parse_curve_data(block: str, expected: List[List[float]]):
+    data: np.ndarray = parse_curve_data(block)
+    assert data.tolist() == expected
+
+
+@pytest.mark.parametrize('block', ['1 2\n3\n4 5 6', '1 2 3\n4', '1 2\n\n3 4'])
+def test_parse_ragged_curve_data(block: str):
+    # the rows of different widths are not to be reshaped into a table
+    with pytest.raises(ValueError):
+        parse_curve_data(block)
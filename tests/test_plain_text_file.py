@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+import pytest
+
+from plain_text_file import PlainTextImportSettings
+
+
+@pytest.mark.parametrize(('separator', 'combine_separators', 'line', 'words'), [
+    ('\t', True, 'Signal power\t\tFrequency\n', ['Signal power', 'Frequency']),
+    ('\t', False, 'Signal power\t\tFrequency\n', ['Signal power', '', 'Frequency']),
+    (' ', True, ' 1   2  3\n', ['1', '2', '3']),
+    ('', True, ' 1 \t 2  3\n', ['1', '2', '3']),
+    (',', False, '1, 2,,3\n', ['1', '2', '', '3']),
+])
+def test_split_line(separator: str, combine_separators: bool, line: str, words: List[str]):
+    settings: PlainTextImportSettings = PlainTextImportSettings()
+    settings.separator = separator
+    settings.combine_separators = combine_separators
+    assert settings.split_line(line) == words